@@ -2,31 +2,17 @@
 动画效果模块
 包含各种图像动画效果的实现
 动画效果分为三类：图像出现、图像消失和图像强调
+
+效果统一登记在 registry 中，按需导入；效果函数（如 animations.fade_in）也在首次访问时才导入所在模块
 """
 
-# 图像出现效果
-from .appear import fade_in, slide_in_from_left, slide_in_from_top
+from .registry import CATEGORIES, EFFECTS, REGISTRY, EffectInfo, effect_info, effects_by_category
 
-# 图像消失效果
-from .disappear import fade_out, slide_out_to_right, slide_out_to_bottom
+_FUNCTIONS = {info.function: info for info in REGISTRY.values()}
 
-# 图像强调效果
-from .emphasis import pulse, shake, bounce
 
-# 动画效果映射表，按类别分组
-EFFECTS = {
-    # 图像出现类
-    "淡入出现": fade_in,
-    "从左滑入": slide_in_from_left,
-    "从上滑入": slide_in_from_top,
-    
-    # 图像消失类
-    "淡出消失": fade_out,
-    "向右滑出": slide_out_to_right,
-    "向下滑出": slide_out_to_bottom,
-    
-    # 图像强调类
-    "脉冲效果": pulse,
-    "左右摇晃": shake,
-    "上下弹跳": bounce,
-}
+def __getattr__(name: str):
+    info = _FUNCTIONS.get(name)
+    if info is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return info.load()
@@ -0,0 +1,162 @@
+"""
+批量帧渲染
+平移类效果的每一帧都只是同一张源图的整数偏移，这里直接在 NumPy 数组上
+按批切片拷贝，不再为每帧创建 PIL 画布并做带蒙版的 paste；
+淡入淡出类效果只计算 alpha 平面，RGB 平面在所有帧间共享；
+参数重复的帧只渲染一次并复用引用
+"""
+
+from typing import Callable, Hashable, Iterable, Iterator, List, Sequence, Tuple
+
+import numpy as np
+from PIL import Image
+
+from . import framestore
+from .frames import TRANSPARENT_WHITE, AlphaFrame, Frame
+
+# 每批预分配的帧数，兼顾向量化收益与峰值内存
+BATCH_SIZE = 8
+
+
+def paste_source(img: Image.Image, background: Tuple[int, int, int, int] = TRANSPARENT_WHITE) -> np.ndarray:
+    """
+    预先计算 canvas.paste(img, pos, img) 在背景色画布上的结果。
+
+    带蒙版的 paste 对每个像素做 dst = (dst * (255 - a) + src * a) / 255，
+    背景是纯色，因此混合结果与粘贴位置无关，只需计算一次。
+    取整方式与 Pillow 的 Paste.c 保持一致，输出逐像素相同。
+    """
+    src = np.asarray(img.convert("RGBA"))
+    alpha = src[..., 3:4]
+    if alpha.min() == 255:
+        # 完全不透明时混合结果就是源图本身
+        return src
+    mask = alpha.astype(np.uint32)
+    tmp = np.array(background, np.uint32) * (255 - mask) + src.astype(np.uint32) * mask + 128
+    return (((tmp >> 8) + tmp) >> 8).astype(np.uint8)
+
+
+def reuse_frames(keys: Iterable[Hashable], render: Callable[[List[Hashable]], Iterator[Frame]]) -> Iterator[Frame]:
+    """
+    对相同的变换参数只渲染一次，重复出现时直接产出同一个帧对象的引用。
+
+    周期性或对称的效果（脉冲、摇晃、弹跳、摆动等）有大量参数完全相同的帧，
+    复用引用可以省去重复的重采样；编码器也可以据此识别重复帧。
+    每个帧在其参数最后一次出现后即被释放，内存中只保留之后还会用到的帧；
+    启用磁盘帧存储且这些帧超出内存上限时，它们改为保存在暂存目录的 memmap 中。
+
+    Args:
+        keys: 每帧的变换参数，需可哈希
+        render: 接收去重后的参数列表（按首次出现顺序），依次产出对应帧
+
+    Returns:
+        帧生成器，重复参数对应的帧是同一个对象
+    """
+    keys = list(keys)
+    last_use = {key: index for index, key in enumerate(keys)}
+    rendered = render(list(dict.fromkeys(keys)))
+
+    cache = {}
+    store, store_checked = None, False
+    for index, key in enumerate(keys):
+        frame = cache.get(key)
+        if frame is None:
+            # 去重后的参数按首次出现顺序渲染，下一帧正好对应当前参数
+            frame = next(rendered)
+            if last_use[key] > index:
+                if not store_checked and isinstance(frame, np.ndarray):
+                    # 待复用帧的总量超出内存上限时，改为保留在磁盘帧存储中
+                    store, store_checked = framestore.spill_store(frame, keys), True
+                if store is not None and isinstance(frame, np.ndarray):
+                    frame = store.put(frame)
+                cache[key] = frame
+        elif last_use[key] == index:
+            del cache[key]
+        yield frame
+
+
+def render_translations(img: Image.Image, offsets: Iterable[Tuple[int, int]],
+                        batch_size: int = BATCH_SIZE) -> Iterator[np.ndarray]:
+    """
+    按给定的整数偏移逐帧平移图像。
+
+    Args:
+        img: 输入图像
+        offsets: 每帧图像左上角的 (x, y) 位置，相同的偏移只渲染一次
+        batch_size: 每批预分配的帧数
+
+    Returns:
+        (H, W, 4) uint8 帧生成器，每帧都是一批 (N, H, W, 4) 数组中的切片
+    """
+    src = paste_source(img)
+    return reuse_frames(offsets, lambda unique: _translate_batches(src, unique, batch_size))
+
+
+def _translate_batches(src: np.ndarray, offsets: List[Tuple[int, int]], batch_size: int) -> Iterator[np.ndarray]:
+    """按批渲染各偏移对应的平移帧"""
+    h, w = src.shape[:2]
+    # 以 uint32 标量填充背景，比逐通道广播快得多
+    background = np.array(TRANSPARENT_WHITE, np.uint8).view(np.uint32)[0]
+
+    for start in range(0, len(offsets), batch_size):
+        chunk = offsets[start:start + batch_size]
+        batch = np.empty((len(chunk), h, w, 4), np.uint8)
+
+        for frame, (dx, dy) in zip(batch, chunk):
+            pixels = frame.view(np.uint32)[..., 0]
+
+            # 源图在画布上的可见区域
+            x0, x1 = min(max(dx, 0), w), max(min(w + dx, w), 0)
+            y0, y1 = min(max(dy, 0), h), max(min(h + dy, h), 0)
+            if x0 >= x1 or y0 >= y1:
+                pixels.fill(background)
+                yield frame
+                continue
+
+            # 只填充未被覆盖的条带
+            pixels[:y0] = background
+            pixels[y1:] = background
+            pixels[y0:y1, :x0] = background
+            pixels[y0:y1, x1:] = background
+            frame[y0:y1, x0:x1] = src[y0 - dy:y1 - dy, x0 - dx:x1 - dx]
+            yield frame
+
+
+def render_alpha_ramp(img: Image.Image, factors: Sequence[float], replace: bool = False,
+                      batch_size: int = BATCH_SIZE) -> Iterator[AlphaFrame]:
+    """
+    只改变透明度的帧序列，所有帧共享同一份 RGB 平面。
+
+    每批帧的 alpha 平面直接写入预分配的 uint8 数组：缩放原图 alpha 时每帧先算出
+    256 项的查找表再逐像素查表，不产生浮点中间数组，内存与耗时只随 H×W×N 的 alpha 数据增长，
+    而不是完整的四通道。
+
+    Args:
+        img: 输入图像
+        factors: 每帧的透明度系数 (0~1)
+        replace: 为 True 时 alpha 直接取 int(255 * 系数)（等同 putalpha），
+            否则按系数缩放原图的 alpha 通道
+        batch_size: 每批计算的帧数
+
+    Returns:
+        AlphaFrame 生成器
+    """
+    src = np.asarray(img.convert("RGBA"))
+    rgb = np.ascontiguousarray(src[..., :3].transpose(2, 0, 1))
+    h, w = src.shape[:2]
+    factors = np.asarray(factors, dtype=np.float64)
+
+    src_alpha = src[..., 3]
+    levels = np.arange(256, dtype=np.float64)
+
+    for start in range(0, len(factors), batch_size):
+        chunk = factors[start:start + batch_size]
+        alphas = np.empty((len(chunk), h, w), np.uint8)
+        if replace:
+            alphas[...] = (255 * chunk).astype(np.uint8)[:, None, None]
+        else:
+            for alpha, factor in zip(alphas, chunk):
+                # 查找表与逐像素计算 int(a * factor) 的结果相同
+                np.take((levels * factor).astype(np.uint8), src_alpha, out=alpha)
+        for alpha in alphas:
+            yield AlphaFrame(rgb, alpha)
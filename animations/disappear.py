@@ -3,81 +3,39 @@
 包含淡出、滑出等效果
 """
 
-from typing import List
+from typing import Iterator
 import numpy as np
 from PIL import Image
 
+from .batch import render_alpha_ramp, render_translations
+from . import tracks
+from .frames import AlphaFrame
+from .tracks import sample_track, sample_transforms
+from .transform import render_transforms
 
-def fade_out(img: Image.Image, num_frames: int = 20) -> List[Image.Image]:
+
+def fade_out(img: Image.Image, num_frames: int = 20) -> Iterator[AlphaFrame]:
     """图像淡出效果（由完全显示到透明）"""
-    frames = []
-    
-    # 确保图像有Alpha通道
-    img = img.convert("RGBA")
-    img_array = np.array(img)
-    
-    # 创建一系列透明度递减的帧
-    for step in range(num_frames + 1):
-        alpha = 1 - (step / num_frames)  # 从1到0的透明度
-        
-        # 创建当前帧的副本
-        frame_array = img_array.copy()
-        
-        # 修改alpha通道
-        frame_array[:, :, 3] = (frame_array[:, :, 3] * alpha).astype(np.uint8)
-        
-        # 转换回PIL图像
-        frame = Image.fromarray(frame_array)
-        frames.append(frame)
-    
-    return frames
+    # 按从1到0的系数缩放原图的alpha通道，RGB平面在所有帧间共享
+    factors = [state.opacity for state in sample_track(tracks.fade_out, img.size, num_frames)]
+    return render_alpha_ramp(img, factors)
 
 
-def slide_out_to_right(img: Image.Image, num_frames: int = 20) -> List[Image.Image]:
+def slide_out_to_right(img: Image.Image, num_frames: int = 20) -> Iterator[np.ndarray]:
     """图像向右滑出"""
-    frames = []
-    w, h = img.size
-    img = img.convert("RGBA")  # 确保有Alpha通道
-    
-    for step in range(num_frames + 1):
-        # 计算当前位置，从图像完全显示到完全滑出右侧
-        progress = step / num_frames
-        start_x = int(w * progress)
-        
-        # 创建与原始图像大小相同的透明画布
-        canvas = Image.new("RGBA", (w, h), (255, 255, 255, 0))
-        
-        # 将图像放置在计算出的位置
-        canvas.paste(img, (start_x, 0), img)
-        
-        frames.append(canvas)
-    
-    return frames
+    # 每帧位置由轨迹给出，从图像完全显示到完全滑出右侧
+    transforms = sample_transforms(tracks.slide_out_to_right, img.size, num_frames)
+    return render_translations(img, [transform.offset for transform in transforms])
 
 
-def slide_out_to_bottom(img: Image.Image, num_frames: int = 20) -> List[Image.Image]:
+def slide_out_to_bottom(img: Image.Image, num_frames: int = 20) -> Iterator[np.ndarray]:
     """图像向下滑出"""
-    frames = []
-    w, h = img.size
-    img = img.convert("RGBA")  # 确保有Alpha通道
-    
-    for step in range(num_frames + 1):
-        # 计算当前位置，从图像完全显示到完全滑出底部
-        progress = step / num_frames
-        start_y = int(h * progress)
-        
-        # 创建与原始图像大小相同的透明画布
-        canvas = Image.new("RGBA", (w, h), (255, 255, 255, 0))
-        
-        # 将图像放置在计算出的位置
-        canvas.paste(img, (0, start_y), img)
-        
-        frames.append(canvas)
-    
-    return frames
+    # 每帧位置由轨迹给出，从图像完全显示到完全滑出底部
+    transforms = sample_transforms(tracks.slide_out_to_bottom, img.size, num_frames)
+    return render_translations(img, [transform.offset for transform in transforms])
 
 
-def zoom_out(img: Image.Image, num_frames: int) -> List[Image.Image]:
+def zoom_out(img: Image.Image, num_frames: int) -> Iterator[np.ndarray]:
     """
     图像缩小至中心点消失。
 
@@ -86,28 +44,7 @@ def zoom_out(img: Image.Image, num_frames: int) -> List[Image.Image]:
         num_frames: 动画的总帧数
 
     Returns:
-        动画帧列表
+        动画帧生成器
     """
-    frames = []
-    original_width, original_height = img.size
-    
-    scale_factors = np.linspace(1.0, 0.01, num_frames)
-    
-    for scale in scale_factors:
-        new_width = int(original_width * scale)
-        new_height = int(original_height * scale)
-        
-        if new_width < 1 or new_height < 1:
-            resized_img = Image.new('RGBA', (1, 1), (0, 0, 0, 0))
-        else:
-            resized_img = img.resize((new_width, new_height), resample=Image.BICUBIC)
-        
-        background = Image.new('RGBA', img.size, (255, 255, 255, 0))
-        
-        paste_x = (original_width - new_width) // 2
-        paste_y = (original_height - new_height) // 2
-        
-        background.paste(resized_img, (paste_x, paste_y), resized_img)
-        frames.append(background)
-        
-    return frames
+    # 以中心为支点缩放，每帧一次仿射采样
+    return render_transforms(img, sample_transforms(tracks.zoom_out, img.size, num_frames))
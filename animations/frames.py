@@ -0,0 +1,95 @@
+"""
+动画帧类型
+效果函数产出的帧可以是 PIL 图像、(H, W, 4) 的 uint8 NumPy 数组，
+或者只有 alpha 平面逐帧变化的 AlphaFrame
+"""
+
+from typing import Union
+
+import numpy as np
+from PIL import Image
+
+# 效果画布的默认背景：透明白色，与 Image.new("RGBA", size, (255, 255, 255, 0)) 一致
+TRANSPARENT_WHITE = (255, 255, 255, 0)
+
+
+class AlphaFrame:
+    """
+    RGB 平面在所有帧之间共享、只有 alpha 平面各不相同的帧。
+
+    rgb 为 (3, H, W) 的平面数组，同一效果的所有帧引用同一个对象；
+    alpha 为该帧独有的 (H, W) 平面。编码器可以直接按平面写出，
+    无需展开成完整的 RGBA 拷贝。
+    """
+
+    __slots__ = ("rgb", "alpha", "__weakref__")
+
+    def __init__(self, rgb: np.ndarray, alpha: np.ndarray):
+        self.rgb = rgb
+        self.alpha = alpha
+
+    @property
+    def size(self) -> tuple:
+        return self.alpha.shape[1], self.alpha.shape[0]
+
+    def to_array(self) -> np.ndarray:
+        """展开为 (H, W, 4) 的 RGBA 数组"""
+        h, w = self.alpha.shape
+        out = np.empty((h, w, 4), np.uint8)
+        out[..., :3] = self.rgb.transpose(1, 2, 0)
+        out[..., 3] = self.alpha
+        return out
+
+    def __array__(self, dtype=None, copy=None) -> np.ndarray:
+        array = self.to_array()
+        return array if dtype is None else array.astype(dtype)
+
+    def to_image(self) -> Image.Image:
+        """合并为 RGBA 模式的 PIL 图像"""
+        bands = [Image.fromarray(plane) for plane in self.rgb]
+        return Image.merge("RGBA", bands + [Image.fromarray(self.alpha)])
+
+
+Frame = Union[Image.Image, np.ndarray, AlphaFrame]
+
+
+def rgb_planes(img: Image.Image) -> np.ndarray:
+    """提取图像的 RGB 平面，返回 (3, H, W) 的连续数组"""
+    return np.ascontiguousarray(np.asarray(img.convert("RGBA"))[..., :3].transpose(2, 0, 1))
+
+
+def frame_size(frame: Frame) -> tuple:
+    """返回帧的 (宽, 高)"""
+    if isinstance(frame, (Image.Image, AlphaFrame)):
+        return frame.size
+    return frame.shape[1], frame.shape[0]
+
+
+def to_array(frame: Frame) -> np.ndarray:
+    """将帧转换为 (H, W, 4) 的 uint8 数组，数组帧原样返回"""
+    if isinstance(frame, AlphaFrame):
+        return frame.to_array()
+    if isinstance(frame, Image.Image):
+        return np.asarray(frame.convert("RGBA") if frame.mode != "RGBA" else frame)
+    return frame
+
+
+def to_image(frame: Frame) -> Image.Image:
+    """将帧转换为 RGBA 模式的 PIL 图像"""
+    if isinstance(frame, AlphaFrame):
+        return frame.to_image()
+    if isinstance(frame, Image.Image):
+        return frame
+    return Image.fromarray(frame, "RGBA")
+
+
+def frame_progress(num_frames: int, periodic: bool = False) -> np.ndarray:
+    """
+    各帧在动画中的进度，共 num_frames 个。
+
+    非循环效果首末帧分别对应起止状态 (0 与 1)；循环效果按 i / num_frames 采样，
+    最后一帧不重复首帧，循环播放时没有停顿的接缝帧
+    """
+    if periodic:
+        return np.arange(num_frames) / max(num_frames, 1)
+    return np.linspace(0.0, 1.0, num_frames)
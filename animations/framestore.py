@@ -0,0 +1,109 @@
+"""
+磁盘帧存储
+对称、周期性的效果要把之后还会复用的帧保留在内存中，超大图像或很长的动画里
+这些帧的总量可能远超内存。配置暂存目录后，超出内存上限的待复用帧写入暂存目录下的
+NumPy memmap 文件：数据由页缓存承载，可以随时被系统写回磁盘并回收，常驻内存不再随帧数增长。
+文件是匿名临时文件，最后一个引用释放后由系统删除，进程异常退出也不会遗留
+"""
+
+import tempfile
+import threading
+from typing import Dict, Hashable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# 单个效果中待复用帧的内存上限（字节），超出时写入暂存目录
+DEFAULT_MEMORY_LIMIT = 256 * 1024 * 1024
+
+_scratch_dir: Optional[str] = None
+_enabled = False
+_memory_limit = DEFAULT_MEMORY_LIMIT
+_lock = threading.Lock()
+
+
+def configure(scratch_dir: Optional[str], memory_limit: int = DEFAULT_MEMORY_LIMIT) -> None:
+    """
+    启用或关闭磁盘帧存储。
+
+    Args:
+        scratch_dir: memmap 文件所在目录，"" 表示系统临时目录，None 表示关闭（所有帧都保留在内存中）
+        memory_limit: 单个效果待复用帧的内存上限（字节），超出时才写入磁盘；0 表示总是写入磁盘
+    """
+    global _scratch_dir, _enabled, _memory_limit
+    with _lock:
+        _enabled = scratch_dir is not None
+        _scratch_dir = scratch_dir or None
+        _memory_limit = memory_limit
+
+
+class FrameStore:
+    """
+    定长的磁盘帧存储，每帧占一个槽位。
+
+    槽位不回收：编码器可能在效果层释放帧之后仍持有它（如 APNG 的上一帧），
+    因此写入的帧在整个效果期间保持不变，容量按需要保留的帧数一次分配。
+    """
+
+    def __init__(self, frame_shape: Tuple[int, ...], capacity: int, scratch_dir: Optional[str] = None):
+        with tempfile.TemporaryFile(prefix="frames-", dir=scratch_dir) as file:
+            # 映射建立后即可关闭文件，数据在最后一个视图释放前保持有效
+            self.frames = np.memmap(file, np.uint8, "w+", shape=(capacity,) + tuple(frame_shape))
+        self._count = 0
+
+    def put(self, frame: np.ndarray) -> np.ndarray:
+        """把帧拷贝到下一个槽位，返回该槽位的视图"""
+        if self._count >= len(self.frames):
+            raise ValueError("帧存储已满")
+        slot = self.frames[self._count]
+        slot[...] = frame
+        self._count += 1
+        return slot
+
+
+def spill_store(frame: np.ndarray, keys: Sequence[Hashable]) -> Optional[FrameStore]:
+    """
+    按 reuse_frames 的帧参数估算待复用帧的峰值内存，超出上限时创建磁盘存储。
+
+    Args:
+        frame: 首个渲染出的帧，用于确定帧的形状和大小
+        keys: 每帧的参数，参数相同的帧在首次和最后一次出现之间需要保留
+
+    Returns:
+        磁盘存储；未启用或峰值未超出上限时为 None
+    """
+    with _lock:
+        enabled, scratch_dir, memory_limit = _enabled, _scratch_dir, _memory_limit
+    if not enabled:
+        return None
+    spans = _reuse_spans(keys)
+    if not spans or _peak_live(spans) * frame.nbytes <= memory_limit:
+        return None
+    return FrameStore(frame.shape, len(spans), scratch_dir)
+
+
+def peak_reuse(keys: Sequence[Hashable]) -> int:
+    """按 reuse_frames 的帧参数计算同时需要保留以待复用的帧数的最大值"""
+    spans = _reuse_spans(keys)
+    return _peak_live(spans) if spans else 0
+
+
+def _reuse_spans(keys: Sequence[Hashable]) -> List[Tuple[int, int]]:
+    """出现多次的参数首次和最后一次出现的位置"""
+    first: Dict[Hashable, int] = {}
+    last: Dict[Hashable, int] = {}
+    for index, key in enumerate(keys):
+        first.setdefault(key, index)
+        last[key] = index
+    return [(first[key], last[key]) for key in first if last[key] > first[key]]
+
+
+def _peak_live(spans: List[Tuple[int, int]]) -> int:
+    """同时需要保留的帧数的最大值"""
+    # 同一位置上先计入新保留的帧，再释放最后一次使用的帧
+    events = sorted([(start, 1) for start, _ in spans] + [(end, -1) for _, end in spans],
+                    key=lambda event: (event[0], -event[1]))
+    live = peak = 0
+    for _, delta in events:
+        live += delta
+        peak = max(peak, live)
+    return peak
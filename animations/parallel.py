@@ -0,0 +1,127 @@
+"""
+多进程帧渲染
+把逐帧重采样（旋转、缩放）的帧参数分块交给进程池并行渲染。
+源图像通过共享内存只传递一次，各任务只携带帧参数，结果按原顺序返回
+"""
+
+import multiprocessing
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any, Callable, Iterator, List, Optional, Sequence, Union
+
+import numpy as np
+from PIL import Image
+
+from .frames import Frame
+
+# 单帧渲染函数：接收源图像和该帧的参数，返回与源图像同尺寸的 RGBA 帧（图像或 (H, W, 4) 数组）
+FrameFn = Callable[[Image.Image, Any], Union[Image.Image, np.ndarray]]
+
+# 帧数少于该值时并行的调度开销大于收益，直接串行渲染
+MIN_PARALLEL_FRAMES = 4
+
+_executor: Optional[ProcessPoolExecutor] = None
+_workers = 0
+_lock = threading.Lock()
+
+# 工作进程内缓存当前效果的源图像，同一效果的后续分块无需重新读取
+_attached = {}
+
+
+def configure(workers: int) -> None:
+    """
+    设置渲染进程数。
+
+    Args:
+        workers: 工作进程数，0 或 1 表示关闭并行，在当前进程内串行渲染
+    """
+    global _executor, _workers
+    with _lock:
+        if workers == _workers:
+            return
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+        _workers = workers if workers > 1 else 0
+        if _workers:
+            # 使用 spawn 避免在带有线程的进程（如 Gradio 服务）中 fork
+            _executor = ProcessPoolExecutor(_workers, mp_context=multiprocessing.get_context("spawn"))
+
+
+def shutdown() -> None:
+    """关闭进程池"""
+    configure(0)
+
+
+def map_frames(frame_fn: FrameFn, img: Image.Image, params: Sequence[Any]) -> Iterator[Frame]:
+    """
+    按参数逐帧渲染，进程池可用时并行执行。
+
+    Args:
+        frame_fn: 模块级的单帧渲染函数（需可被 pickle）
+        img: 源图像 (RGBA)
+        params: 每帧的参数
+
+    Returns:
+        按 params 顺序产出的帧生成器
+    """
+    with _lock:
+        executor, workers = _executor, _workers
+    if executor is None or len(params) < MIN_PARALLEL_FRAMES:
+        return (frame_fn(img, param) for param in params)
+    return _map_parallel(executor, workers, frame_fn, img, list(params))
+
+
+def _map_parallel(executor: ProcessPoolExecutor, workers: int, frame_fn: FrameFn,
+                  img: Image.Image, params: List[Any]) -> Iterator[np.ndarray]:
+    # 共享内存按每像素 4 字节传递，预处理过的 "RGBa" 源图保持原模式
+    if img.mode not in ("RGBA", "RGBa"):
+        img = img.convert("RGBA")
+    w, h = img.size
+    shm = SharedMemory(create=True, size=max(w * h * 4, 1))
+    pending = deque()
+    try:
+        shm.buf[:w * h * 4] = img.tobytes()
+
+        # 分块数约为进程数的 4 倍以均衡负载，同时限制在途分块数以控制内存
+        chunk_size = max(1, -(-len(params) // (workers * 4)))
+        chunks = [params[start:start + chunk_size] for start in range(0, len(params), chunk_size)]
+        next_chunk = 0
+        while pending or next_chunk < len(chunks):
+            while next_chunk < len(chunks) and len(pending) < workers * 2:
+                pending.append(executor.submit(_render_chunk, shm.name, img.mode, (w, h), frame_fn,
+                                               chunks[next_chunk]))
+                next_chunk += 1
+            for data in pending.popleft().result():
+                yield np.frombuffer(data, np.uint8).reshape(h, w, 4)
+    finally:
+        for future in pending:
+            future.cancel()
+        shm.close()
+        shm.unlink()
+
+
+def _attach(name: str, mode: str, size) -> Image.Image:
+    """在工作进程中读取共享内存里的源图像，同一效果的后续分块直接复用"""
+    if name in _attached:
+        return _attached[name]
+    _attached.clear()
+
+    shm = SharedMemory(name=name)
+    try:
+        # 拷贝到进程私有内存后立即关闭映射，共享内存由主进程负责释放
+        shared = Image.frombuffer(mode, size, shm.buf, "raw", mode, 0, 1)
+        img = shared.copy()
+        del shared
+    finally:
+        shm.close()
+    _attached[name] = img
+    return img
+
+
+def _render_chunk(name: str, mode: str, size, frame_fn: FrameFn, params: List[Any]) -> List[bytes]:
+    """工作进程入口：渲染一个分块内的所有帧"""
+    img = _attach(name, mode, size)
+    return [frame_fn(img, param).tobytes() for param in params]
@@ -0,0 +1,125 @@
+"""
+效果注册表
+所有效果的名称、分类和元数据集中登记在这里，界面、流水线、批处理和 API 共用同一份注册表。
+登记时只记录效果函数所在的模块和函数名，首次使用某个效果时才导入对应模块，
+只需要查询效果列表或元数据的入口（命令行参数校验、任务调度等）不必加载渲染代码
+"""
+
+import importlib
+from types import MappingProxyType
+from typing import Callable, Dict, Iterator, List, Mapping, NamedTuple, Optional
+
+# 效果分类及其在界面上的名称
+CATEGORIES = {
+    "appear": "出现效果",
+    "disappear": "消失效果",
+    "emphasis": "强调效果",
+}
+
+
+class EffectInfo(NamedTuple):
+    """
+    一个效果的登记信息。所有效果都恰好产出请求的 num_frames 帧。
+
+    Attributes:
+        name: 效果名称（界面、API 和批处理中使用的键）
+        category: 分类，CATEGORIES 中的键
+        module: 效果函数所在的模块（相对 animations 包）
+        function: 效果函数名
+        params: 效果函数除 img、num_frames 外的参数及其默认值
+        periodic: 结束时回到起始状态，可以无缝循环播放；效果按周期采样，最后一帧不重复首帧
+            （frame_progress(num_frames, periodic=True)），其余效果首末帧分别为起止状态
+        symmetric: 帧序列前后对称或周期重复，约一半的帧可以复用
+        alpha_only: 只改变透明度，帧为共享 RGB 平面的 AlphaFrame
+        cost: 渲染一个不重复帧的相对成本（每像素），以整帧拷贝为 1；
+            仿射重采样远高于平移拷贝，只改 alpha 的帧低于整帧拷贝
+    """
+    name: str
+    category: str
+    module: str
+    function: str
+    params: Mapping = MappingProxyType({})
+    periodic: bool = False
+    symmetric: bool = False
+    alpha_only: bool = False
+    cost: float = 1.0
+
+    def load(self) -> Callable:
+        """导入并返回效果函数，模块只在首次调用时导入"""
+        return getattr(importlib.import_module(f".{self.module}", __package__), self.function)
+
+
+# 各类渲染方式的相对成本（由基准测试标定，见 core.cost.calibrate）：
+# 只缩放的仿射采样约为整帧拷贝的 15~30 倍，带旋转的约 80 倍
+_ALPHA_COST = 0.3
+# 按系数缩放原图 alpha 的查表，比直接填充常数 alpha 慢约一个数量级
+_ALPHA_SCALE_COST = 3.0
+_SCALE_COST = 15.0
+_ROTATE_COST = 80.0
+
+_EFFECTS = [
+    # 入场效果
+    EffectInfo("淡入", "appear", "appear", "fade_in", alpha_only=True, cost=_ALPHA_COST),
+    EffectInfo("滑入", "appear", "appear", "slide_in_from_left"),
+    EffectInfo("顶部滑入", "appear", "appear", "slide_in_from_top"),
+    EffectInfo("放大出现", "appear", "appear", "zoom_in", cost=_SCALE_COST),
+    # 消失效果
+    # 淡出按系数缩放原图的 alpha，比淡入直接填充常数慢
+    EffectInfo("淡出", "disappear", "disappear", "fade_out", alpha_only=True, cost=_ALPHA_SCALE_COST),
+    EffectInfo("滑出", "disappear", "disappear", "slide_out_to_right"),
+    EffectInfo("底部滑出", "disappear", "disappear", "slide_out_to_bottom"),
+    EffectInfo("缩小消失", "disappear", "disappear", "zoom_out", cost=_SCALE_COST),
+    # 强调效果
+    EffectInfo("脉冲", "emphasis", "emphasis", "pulse", {"max_scale": 1.2}, periodic=True, symmetric=True,
+               cost=2 * _SCALE_COST),
+    EffectInfo("摇晃", "emphasis", "emphasis", "shake", {"amplitude": 10}, periodic=True, symmetric=True),
+    EffectInfo("弹跳", "emphasis", "emphasis", "bounce", {"amplitude": 20}, periodic=True, symmetric=True),
+    EffectInfo("旋转", "emphasis", "emphasis", "spin", periodic=True, cost=_ROTATE_COST),
+    # 惊喜结尾保持静止，不是循环的一个相位，按起止两端采样
+    EffectInfo("惊喜", "emphasis", "emphasis", "tada", cost=2 * _SCALE_COST),
+    # 闪烁在源图与全透明帧之间整帧切换（两个帧对象反复产出），并非 alpha 渐变
+    EffectInfo("闪烁", "emphasis", "emphasis", "flash", periodic=True, symmetric=True, cost=0.05),
+    EffectInfo("摆动", "emphasis", "emphasis", "swing", periodic=True, symmetric=True, cost=_ROTATE_COST),
+]
+
+REGISTRY: Dict[str, EffectInfo] = {info.name: info for info in _EFFECTS}
+
+
+class _LazyEffects(Mapping):
+    """效果名称 → 效果函数的只读映射，取值时才导入效果所在的模块"""
+
+    def __init__(self, registry: Dict[str, EffectInfo]):
+        self._registry = registry
+        self._loaded: Dict[str, Callable] = {}
+
+    def __getitem__(self, name: str) -> Callable:
+        fn = self._loaded.get(name)
+        if fn is None:
+            fn = self._loaded[name] = self._registry[name].load()
+        return fn
+
+    def __contains__(self, name) -> bool:
+        return name in self._registry
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._registry)
+
+    def __len__(self) -> int:
+        return len(self._registry)
+
+
+# 效果名称 → 效果函数，按登记顺序排列
+EFFECTS: Mapping[str, Callable] = _LazyEffects(REGISTRY)
+
+
+def effect_info(name: str) -> Optional[EffectInfo]:
+    """按名称查询效果的登记信息，未知效果返回 None"""
+    return REGISTRY.get(name)
+
+
+def effects_by_category() -> Dict[str, List[str]]:
+    """按分类分组的效果名称，键为分类在界面上的名称"""
+    groups: Dict[str, List[str]] = {label: [] for label in CATEGORIES.values()}
+    for info in _EFFECTS:
+        groups[CATEGORIES[info.category]].append(info.name)
+    return groups
@@ -0,0 +1,108 @@
+"""
+多效果时间轴
+把出现、强调、消失等效果按顺序串联成一个动画，每段有各自的时长和缓动曲线。
+
+每个效果用 tracks 中的一条“轨迹”描述：进度 p (0~1) → 该时刻的仿射变换和不透明度，
+与单独的效果函数共用同一份定义。时间轴先算出所有帧的状态，再统一渲染：
+每帧都只从同一张预处理过的源图做一次仿射采样（整数平移直接切片拷贝），
+串联的段数再多也不会叠加重采样；源图只预处理一次，帧流交给一个编码器逐帧编码
+"""
+
+from typing import Callable, Dict, Iterator, List, NamedTuple, Sequence, Tuple
+
+import numpy as np
+from PIL import Image
+
+from .batch import reuse_frames
+from .frames import Frame
+from .parallel import map_frames
+from .tracks import TRACKS, FrameState, quantize
+from .transform import blank_frame, composite_source, transform_frame
+
+
+class Segment(NamedTuple):
+    """
+    时间轴上的一段。
+
+    Attributes:
+        effect: 效果函数名（如 "fade_in"、"pulse"），须在 TRACKS 中有对应的轨迹
+        duration_sec: 该段时长（秒）
+        easing: EASINGS 中的缓动曲线名称
+    """
+    effect: str
+    duration_sec: float
+    easing: str = "linear"
+
+
+# 缓动曲线：把线性进度映射为实际进度，两端固定为 0 和 1
+EASINGS: Dict[str, Callable[[float], float]] = {
+    "linear": lambda p: p,
+    "ease_in": lambda p: p ** 3,
+    "ease_out": lambda p: 1 - (1 - p) ** 3,
+    "ease_in_out": lambda p: 4 * p ** 3 if p < 0.5 else 1 - (-2 * p + 2) ** 3 / 2,
+}
+
+
+# -------------- 渲染 -------------- #
+
+def segment_frames(segments: Sequence[Segment], num_frames: int) -> List[int]:
+    """
+    按各段时长分配总帧数。
+
+    按累计时长取整再求差，各段帧数之和恰好等于 num_frames。
+    """
+    total = sum(segment.duration_sec for segment in segments)
+    if total <= 0:
+        raise ValueError("时间轴总时长必须大于 0")
+    bounds, elapsed = [0], 0.0
+    for segment in segments:
+        elapsed += segment.duration_sec
+        bounds.append(round(num_frames * elapsed / total))
+    return [end - start for start, end in zip(bounds, bounds[1:])]
+
+
+def timeline_states(segments: Sequence[Segment], size: Tuple[int, int], num_frames: int) -> List[FrameState]:
+    """计算时间轴上每一帧的状态"""
+    states = []
+    for segment, count in zip(segments, segment_frames(segments, num_frames)):
+        track = TRACKS.get(segment.effect)
+        if track is None:
+            raise ValueError(f"效果 {segment.effect} 不支持时间轴")
+        easing = EASINGS.get(segment.easing)
+        if easing is None:
+            raise ValueError(f"未知的缓动曲线: {segment.easing}（可选 {', '.join(EASINGS)}）")
+        # 每段的首帧和末帧分别对应进度 0 和 1
+        for index in range(count):
+            progress = index / (count - 1) if count > 1 else 1.0
+            states.append(quantize(track(easing(progress), size)))
+    return states
+
+
+def render_timeline(img: Image.Image, segments: Sequence[Segment], num_frames: int) -> Iterator[Frame]:
+    """
+    渲染时间轴。
+
+    Args:
+        img: 源图像 (RGBA)
+        segments: 按顺序播放的各段
+        num_frames: 总帧数，按各段时长比例分配
+
+    Returns:
+        帧生成器，相同状态的帧只渲染一次并复用引用
+    """
+    states = timeline_states(segments, img.size, num_frames)
+    source = composite_source(img)
+    return reuse_frames(states, lambda unique: map_frames(state_frame, source, unique))
+
+
+def state_frame(source: Image.Image, state: FrameState) -> np.ndarray:
+    """渲染一帧：一次仿射变换，再按不透明度缩放 alpha"""
+    if state.opacity <= 0:
+        return blank_frame(source.size)
+    frame = transform_frame(source, state.transform)
+    if state.opacity >= 1:
+        return frame
+    if not frame.flags.writeable:
+        frame = frame.copy()
+    frame[..., 3] = (frame[..., 3] * state.opacity).astype(np.uint8)
+    return frame
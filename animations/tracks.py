@@ -0,0 +1,172 @@
+"""
+效果轨迹
+每个效果的运动只在这里定义一次：进度 p (0~1) → 该时刻相对源图的仿射变换和不透明度。
+单独的效果函数按帧采样轨迹后交给相应的渲染方式（平移、仿射、alpha 渐变），
+时间轴按各段的进度和缓动曲线采样同一条轨迹，两者的运动始终一致
+"""
+
+import math
+from typing import Callable, Dict, List, NamedTuple, Sequence, Tuple
+
+from .frames import frame_progress
+from .transform import IDENTITY, Transform
+
+
+class FrameState(NamedTuple):
+    """单帧的状态：相对源图的仿射变换和整体不透明度 (0~1)"""
+    transform: Transform = IDENTITY
+    opacity: float = 1.0
+
+
+# 轨迹：(进度, 源图尺寸, 效果参数) → 帧状态；效果参数的默认值与效果函数一致
+Track = Callable[..., FrameState]
+
+
+def _lerp(a: float, b: float, p: float) -> float:
+    return a + (b - a) * p
+
+
+def _piecewise(p: float, keys: Sequence[Tuple[float, float]]) -> float:
+    """按 (进度, 取值) 关键点做分段线性插值"""
+    for (p0, v0), (p1, v1) in zip(keys, keys[1:]):
+        if p <= p1:
+            return _lerp(v0, v1, (p - p0) / (p1 - p0)) if p1 > p0 else v1
+    return keys[-1][1]
+
+
+# -------------- 出现效果 -------------- #
+
+def fade_in(p: float, size: Tuple[int, int]) -> FrameState:
+    return FrameState(opacity=p)
+
+
+def slide_in_from_left(p: float, size: Tuple[int, int]) -> FrameState:
+    # 从图像完全在左侧外到完全显示
+    return FrameState(Transform(offset=(int(-size[0] * (1 - p)), 0)))
+
+
+def slide_in_from_top(p: float, size: Tuple[int, int]) -> FrameState:
+    # 从图像完全在顶部外到完全显示
+    return FrameState(Transform(offset=(0, int(-size[1] * (1 - p)))))
+
+
+def zoom_in(p: float, size: Tuple[int, int]) -> FrameState:
+    # 以中心为支点，从小点放大到原始大小
+    return FrameState(Transform(scale=_lerp(0.01, 1.0, p)))
+
+
+# -------------- 消失效果 -------------- #
+
+def fade_out(p: float, size: Tuple[int, int]) -> FrameState:
+    return FrameState(opacity=1 - p)
+
+
+def slide_out_to_right(p: float, size: Tuple[int, int]) -> FrameState:
+    return FrameState(Transform(offset=(int(size[0] * p), 0)))
+
+
+def slide_out_to_bottom(p: float, size: Tuple[int, int]) -> FrameState:
+    return FrameState(Transform(offset=(0, int(size[1] * p))))
+
+
+def zoom_out(p: float, size: Tuple[int, int]) -> FrameState:
+    return FrameState(Transform(scale=_lerp(1.0, 0.01, p)))
+
+
+# -------------- 强调效果 -------------- #
+
+def pulse(p: float, size: Tuple[int, int], max_scale: float = 1.2) -> FrameState:
+    # 三角波：前半程放大到 max_scale，后半程恢复
+    return FrameState(Transform(scale=1 + (max_scale - 1) * (1 - abs(2 * p - 1))))
+
+
+def shake(p: float, size: Tuple[int, int], amplitude: int = 10) -> FrameState:
+    # 振幅不超过图像宽度的 1/4
+    amplitude = min(amplitude, size[0] // 4)
+    return FrameState(Transform(offset=(int(amplitude * math.sin(2 * math.pi * p)), 0)))
+
+
+def bounce(p: float, size: Tuple[int, int], amplitude: int = 20) -> FrameState:
+    # 振幅不超过图像高度的 1/4，正弦波峰对应图像上移
+    amplitude = min(amplitude, size[1] // 4)
+    return FrameState(Transform(offset=(0, -int(amplitude * math.sin(2 * math.pi * p)))))
+
+
+def spin(p: float, size: Tuple[int, int]) -> FrameState:
+    return FrameState(Transform(angle=360 * p))
+
+
+# tada 的各阶段：0~0.2 放大，0.2~0.4 缩小，0.4~0.8 摇摆（恢复原始大小），之后保持静止
+_TADA_SCALES = ((0.0, 1.0), (0.2, 1.2), (0.4, 0.9), (0.4, 1.0), (1.0, 1.0))
+_TADA_ANGLES = ((0.0, 0.0), (0.4, 0.0), (0.5, -15.0), (0.6, 10.0), (0.7, -5.0), (0.8, 0.0), (1.0, 0.0))
+
+
+def tada(p: float, size: Tuple[int, int]) -> FrameState:
+    return FrameState(Transform(scale=_piecewise(p, _TADA_SCALES), angle=_piecewise(p, _TADA_ANGLES)))
+
+
+# 闪烁的亮、暗阶段数
+FLASH_PHASES = 4
+
+
+def flash(p: float, size: Tuple[int, int]) -> FrameState:
+    # 亮、暗交替，结尾保持可见
+    phase = min(int(p * FLASH_PHASES), FLASH_PHASES - 1)
+    return FrameState(opacity=1.0 if phase % 2 == 0 or p >= 1 else 0.0)
+
+
+def swing(p: float, size: Tuple[int, int]) -> FrameState:
+    # 以顶部中点为支点，像钟摆一样左右摆动一个周期
+    return FrameState(Transform(angle=15 * math.sin(2 * math.pi * p), pivot=(0.5, 0.0)))
+
+
+# 以效果函数名为键，无需导入效果所在的模块
+TRACKS: Dict[str, Track] = {
+    "fade_in": fade_in,
+    "slide_in_from_left": slide_in_from_left,
+    "slide_in_from_top": slide_in_from_top,
+    "zoom_in": zoom_in,
+    "fade_out": fade_out,
+    "slide_out_to_right": slide_out_to_right,
+    "slide_out_to_bottom": slide_out_to_bottom,
+    "zoom_out": zoom_out,
+    "pulse": pulse,
+    "shake": shake,
+    "bounce": bounce,
+    "spin": spin,
+    "tada": tada,
+    "flash": flash,
+    "swing": swing,
+}
+
+
+def quantize(state: FrameState) -> FrameState:
+    """消除浮点尾差，使相同状态的帧只渲染一次；角度取模 360，不透明度按 alpha 的 1/255 取整"""
+    t = state.transform
+    transform = Transform(round(t.scale, 6), round(t.angle, 6) % 360, t.pivot,
+                          (round(t.offset[0], 6), round(t.offset[1], 6)))
+    return FrameState(transform, round(min(max(state.opacity, 0.0), 1.0) * 255) / 255)
+
+
+def sample_track(track: Track, size: Tuple[int, int], num_frames: int, periodic: bool = False,
+                 **params) -> List[FrameState]:
+    """
+    按 frame_progress 的进度对轨迹采样 num_frames 帧。
+
+    Args:
+        track: 效果轨迹
+        size: 源图尺寸
+        num_frames: 帧数
+        periodic: 是否按循环效果采样（最后一帧不重复首帧）
+        **params: 传给轨迹的效果参数
+
+    Returns:
+        每帧的状态
+    """
+    return [track(p, size, **params) for p in frame_progress(num_frames, periodic)]
+
+
+def sample_transforms(track: Track, size: Tuple[int, int], num_frames: int, periodic: bool = False,
+                      **params) -> List[Transform]:
+    """按帧采样轨迹的仿射变换，经 quantize 消除尾差，相同的变换只渲染一次"""
+    return [quantize(state).transform for state in sample_track(track, size, num_frames, periodic, **params)]
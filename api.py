@@ -0,0 +1,387 @@
+"""渲染 HTTP API
+与 Gradio 界面并列的 HTTP/JSON 接口，供其他服务直接请求动画，复用 make_animation、EFFECTS 和渲染任务队列。
+
+    GET    /v1/effects               可用的效果（含分类等元数据）和输出格式
+    POST   /v1/render                上传图片并渲染：默认等待完成并直接返回编码后的数据，
+                                     async=true 时立即返回任务编号
+    POST   /v1/timeline              把多个效果串联为一个动画（segments 为 JSON 数组），其余同 /v1/render
+    GET    /v1/jobs/{id}             任务状态与进度
+    GET    /v1/jobs/{id}/events      以 JSON Lines 流式推送进度，直到任务结束
+    GET    /v1/jobs/{id}/result      取回已完成任务的数据
+    DELETE /v1/jobs/{id}             取消任务
+    POST   /v1/batch                 multipart 批量提交多张图片 / 多组参数，
+                                     结果按完成顺序以 multipart/mixed 流式返回
+
+渲染开始前按 core.cost 预测每个请求的耗时和内存：超出单任务预算时降低分辨率或帧率
+（downgrade=false 时直接拒绝），降到下限仍超出时以 422 拒绝；任务状态中带有准入结果。
+
+本地调试无需任何外部服务，可直接用 fastapi.testclient.TestClient(build_api()) 调用。
+"""
+
+import io
+import json
+import threading
+import time
+import uuid
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from fastapi import FastAPI, File, Form, HTTPException, UploadFile
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from PIL import Image
+
+from core.cost import DOWNGRADE, REJECT, Admission, Budget, admit
+from core.encoders import VIDEO_PROFILES
+from core.jobs import DONE, FAILED, Job, JobQueue, QueueFull
+from animations.registry import REGISTRY
+from animations.timeline import EASINGS
+from core.pipeline import EFFECTS, FORMATS, MAX_OUTPUT_LIMIT, MAX_OUTPUT_SIZE, make_animation, make_timeline
+from core.timing import frame_count
+
+# 请求参数的上限，防止单个请求占用过多资源
+MAX_UPLOAD_BYTES = 32 * 1024 * 1024
+MAX_DURATION_SEC = 30.0
+MAX_FPS = 60
+MAX_BATCH_JOBS = 64
+# 已结束任务的结果保留时间（秒），过期后无法再取回
+RESULT_TTL_SEC = 10 * 60
+# 流式响应轮询任务状态的间隔（秒）
+POLL_INTERVAL_SEC = 0.25
+
+
+class RenderRequest:
+    """一次渲染的参数，校验后可直接提交为任务"""
+
+    def __init__(self, image: Image.Image, effect: str, fmt: str, duration_sec: float = 1.0, fps: int = 15,
+                 max_size: int = MAX_OUTPUT_SIZE, quality: int = 80, lossless: bool = False,
+                 video_profile: str = "default", downgrade: bool = True):
+        if not isinstance(effect, str) or effect not in EFFECTS:
+            raise HTTPException(400, f"未知的效果: {effect}")
+        if not isinstance(fmt, str) or fmt.upper() not in FORMATS:
+            raise HTTPException(400, f"未知的输出格式: {fmt}（可选 {', '.join(FORMATS)}）")
+        if not 0 < duration_sec <= MAX_DURATION_SEC:
+            raise HTTPException(400, f"duration_sec 应在 (0, {MAX_DURATION_SEC:g}] 之间")
+        if not 1 <= fps <= MAX_FPS:
+            raise HTTPException(400, f"fps 应在 [1, {MAX_FPS}] 之间")
+        if not 1 <= max_size <= MAX_OUTPUT_LIMIT:
+            raise HTTPException(400, f"max_size 应在 [1, {MAX_OUTPUT_LIMIT}] 之间")
+        if not 0 <= quality <= 100:
+            raise HTTPException(400, "quality 应在 [0, 100] 之间")
+        if video_profile not in VIDEO_PROFILES:
+            raise HTTPException(400, f"未知的视频编码档位: {video_profile}")
+        self.image = image
+        self.effect = effect
+        self.fmt = fmt
+        self.duration_sec = float(duration_sec)
+        self.fps = int(fps)
+        self.max_size = int(max_size)
+        self.quality = int(quality)
+        self.lossless = bool(lossless)
+        self.video_profile = video_profile
+        self.downgrade = bool(downgrade)
+        self.admission: Optional[Admission] = None
+
+    @property
+    def cost_effect(self):
+        """成本估算使用的效果描述"""
+        return self.effect
+
+    def apply_budget(self, budget: Budget) -> Admission:
+        """按预算决定是否接受，需要降级时改用降级后的分辨率和帧率；超出预算时以 422 拒绝"""
+        admission = admit(self.image.size, self.cost_effect, self.fmt.upper(), self.duration_sec, self.fps,
+                          self.max_size, budget, allow_downgrade=self.downgrade)
+        if admission.action == REJECT:
+            raise HTTPException(422, f"任务超出渲染预算：{admission.reason}")
+        self.max_size, self.fps = admission.max_size, admission.fps
+        self.admission = admission
+        return admission
+
+    @property
+    def total_frames(self) -> int:
+        return self.admission.cost.frames if self.admission else frame_count(self.duration_sec, self.fps)
+
+    def job_info(self) -> Dict:
+        """附加在任务状态中的准入信息"""
+        admission = self.admission
+        if admission is None:
+            return {}
+        info = {"admission": admission.action, "estimated_sec": round(admission.cost.seconds, 3),
+                "estimated_bytes": admission.cost.peak_bytes}
+        if admission.action == DOWNGRADE:
+            info.update(max_size=self.max_size, fps=self.fps, reason=admission.reason)
+        return info
+
+    def render(self, job: Job) -> Tuple[bytes, str]:
+        return make_animation(self.image, self.effect, self.fmt, self.duration_sec, self.fps,
+                              max_size=self.max_size, quality=self.quality, lossless=self.lossless,
+                              video_profile=self.video_profile, on_frame=job.report)
+
+
+class TimelineRequest(RenderRequest):
+    """多效果时间轴的参数，segments 为 [{"effect", "duration_sec", "easing"}, ...]"""
+
+    def __init__(self, image: Image.Image, segments: List[Dict], fmt: str, fps: int = 15,
+                 max_size: int = MAX_OUTPUT_SIZE, quality: int = 80, lossless: bool = False,
+                 video_profile: str = "default", downgrade: bool = True):
+        if not isinstance(segments, list) or not segments:
+            raise HTTPException(400, "segments 应为非空数组")
+        self.segments = []
+        for segment in segments:
+            if not isinstance(segment, dict) or not isinstance(segment.get("effect"), str):
+                raise HTTPException(400, f"无效的时间轴片段: {segment}")
+            easing = segment.get("easing", "linear")
+            if not isinstance(easing, str) or easing not in EASINGS:
+                raise HTTPException(400, f"未知的缓动曲线: {easing}（可选 {', '.join(EASINGS)}）")
+            duration_sec = segment.get("duration_sec", 1.0)
+            if not isinstance(duration_sec, (int, float)) or duration_sec <= 0:
+                raise HTTPException(400, f"片段时长应大于 0: {segment}")
+            self.segments.append((segment["effect"], float(duration_sec), easing))
+        super().__init__(image, self.segments[0][0], fmt, sum(segment[1] for segment in self.segments), fps,
+                         max_size, quality, lossless, video_profile, downgrade)
+        for name, _, _ in self.segments:
+            if name not in EFFECTS:
+                raise HTTPException(400, f"未知的效果: {name}")
+
+    @property
+    def cost_effect(self):
+        return [(name, duration_sec) for name, duration_sec, _ in self.segments]
+
+    def render(self, job: Job) -> Tuple[bytes, str]:
+        return make_timeline(self.image, self.segments, self.fmt, self.fps, max_size=self.max_size,
+                             quality=self.quality, lossless=self.lossless, video_profile=self.video_profile,
+                             on_frame=job.report)
+
+
+def _read_image(data: bytes) -> Image.Image:
+    if len(data) > MAX_UPLOAD_BYTES:
+        raise HTTPException(413, f"图片不能超过 {MAX_UPLOAD_BYTES} 字节")
+    try:
+        img = Image.open(io.BytesIO(data))
+        img.load()
+    except (OSError, Image.DecompressionBombError) as exc:
+        raise HTTPException(400, f"无法读取图片: {exc}")
+    return img
+
+
+def _effect_metadata(name: str) -> Dict:
+    info = REGISTRY[name]
+    return {"category": info.category, "params": dict(info.params), "periodic": info.periodic,
+            "symmetric": info.symmetric, "alpha_only": info.alpha_only, "cost": info.cost}
+
+
+def _job_info(job: Job) -> Dict:
+    info = job.snapshot()
+    if job.status == DONE:
+        data, mime = job.result
+        info.update(mime=mime, bytes=len(data), result=f"/v1/jobs/{job.id}/result")
+    return info
+
+
+class _JobRegistry:
+    """记录经 API 提交的任务，结束后在 RESULT_TTL_SEC 内仍可查询和取回结果"""
+
+    def __init__(self):
+        self._jobs: Dict[int, Job] = {}
+        self._lock = threading.Lock()
+
+    def add(self, job: Job) -> None:
+        with self._lock:
+            self._expire()
+            self._jobs[job.id] = job
+
+    def get(self, job_id: int) -> Job:
+        with self._lock:
+            self._expire()
+            job = self._jobs.get(job_id)
+        if job is None:
+            raise HTTPException(404, f"任务不存在或已过期: {job_id}")
+        return job
+
+    def _expire(self) -> None:
+        now = time.monotonic()
+        for job_id in [job_id for job_id, job in self._jobs.items()
+                       if job.finished is not None and now - job.finished > RESULT_TTL_SEC]:
+            del self._jobs[job_id]
+
+
+def build_api(job_queue: Optional[JobQueue] = None, budget: Optional[Budget] = None) -> FastAPI:
+    """
+    构建渲染 API。
+
+    Args:
+        job_queue: 渲染任务队列，与界面共用时传入同一个队列以共享并发上限；不传则新建
+        budget: 渲染预算，每个请求在提交前按预测成本接受、降级或拒绝；不传则从环境变量读取
+
+    Returns:
+        FastAPI 应用，可单独运行，也可以用 gr.mount_gradio_app 挂载 Gradio 界面
+    """
+    budget = budget or Budget.from_env()
+    job_queue = job_queue or JobQueue(memory_budget=budget.memory_bytes)
+    registry = _JobRegistry()
+    api = FastAPI(title="图像动画实验室 API")
+
+    def queue_job(request: RenderRequest, watched: bool = True) -> Job:
+        """提交已通过准入的请求，排队满时抛出 QueueFull"""
+        return job_queue.submit(request.render, total_frames=request.total_frames, watched=watched,
+                                memory_bytes=request.admission.cost.peak_bytes, info=request.job_info())
+
+    def submit(request: RenderRequest, watched: bool) -> Job:
+        request.apply_budget(budget)
+        try:
+            job = queue_job(request, watched)
+        except QueueFull as exc:
+            raise HTTPException(503, str(exc), headers={"Retry-After": "1"})
+        registry.add(job)
+        return job
+
+    @api.get("/v1/effects")
+    def list_effects():
+        return {"effects": list(EFFECTS), "formats": list(FORMATS), "video_profiles": list(VIDEO_PROFILES),
+                "easings": list(EASINGS), "effect_info": {name: _effect_metadata(name) for name in EFFECTS}}
+
+    def run(request: RenderRequest, async_: bool):
+        """提交请求；异步时立即返回任务信息，否则等待完成并返回编码后的数据"""
+        if async_:
+            job = submit(request, watched=False)
+            return JSONResponse(_job_info(job), status_code=202)
+
+        job = submit(request, watched=True)
+        try:
+            while not job.wait(POLL_INTERVAL_SEC):
+                pass
+        finally:
+            if not job.done:
+                job.cancel()
+        if job.status != DONE:
+            raise HTTPException(500 if job.status == FAILED else 409, job.error or job.status)
+        data, mime = job.result
+        headers = {"X-Job-Id": str(job.id)}
+        if request.admission.action == DOWNGRADE:
+            headers["X-Render-Downgraded"] = f"max_size={request.max_size}; fps={request.fps}"
+        return Response(data, media_type=mime, headers=headers)
+
+    @api.post("/v1/render")
+    def render(image: UploadFile = File(...), effect: str = Form(...), format: str = Form("GIF"),
+               duration_sec: float = Form(1.0), fps: int = Form(15), max_size: int = Form(MAX_OUTPUT_SIZE),
+               quality: int = Form(80), lossless: bool = Form(False), video_profile: str = Form("default"),
+               downgrade: bool = Form(True), async_: bool = Form(False, alias="async")):
+        return run(RenderRequest(_read_image(image.file.read()), effect, format, duration_sec, fps, max_size,
+                                 quality, lossless, video_profile, downgrade), async_)
+
+    @api.post("/v1/timeline")
+    def timeline(image: UploadFile = File(...), segments: str = Form(...), format: str = Form("GIF"),
+                 fps: int = Form(15), max_size: int = Form(MAX_OUTPUT_SIZE), quality: int = Form(80),
+                 lossless: bool = Form(False), video_profile: str = Form("default"),
+                 downgrade: bool = Form(True), async_: bool = Form(False, alias="async")):
+        try:
+            specs = json.loads(segments)
+        except json.JSONDecodeError as exc:
+            raise HTTPException(400, f"segments 不是合法的 JSON: {exc}")
+        return run(TimelineRequest(_read_image(image.file.read()), specs, format, fps, max_size, quality,
+                                   lossless, video_profile, downgrade), async_)
+
+    @api.get("/v1/jobs/{job_id}")
+    def job_status(job_id: int):
+        return _job_info(registry.get(job_id))
+
+    @api.get("/v1/jobs/{job_id}/events")
+    def job_events(job_id: int):
+        job = registry.get(job_id)
+
+        def events() -> Iterator[bytes]:
+            while True:
+                finished = job.wait(POLL_INTERVAL_SEC)
+                yield (json.dumps(_job_info(job), ensure_ascii=False) + "\n").encode()
+                if finished:
+                    return
+
+        return StreamingResponse(events(), media_type="application/x-ndjson")
+
+    @api.get("/v1/jobs/{job_id}/result")
+    def job_result(job_id: int):
+        job = registry.get(job_id)
+        if job.status != DONE:
+            raise HTTPException(409, f"任务尚未完成: {job.status}")
+        data, mime = job.result
+        return Response(data, media_type=mime)
+
+    @api.delete("/v1/jobs/{job_id}")
+    def cancel_job(job_id: int):
+        job = registry.get(job_id)
+        job.cancel()
+        return _job_info(job)
+
+    @api.post("/v1/batch")
+    def batch(images: List[UploadFile] = File(...), jobs: str = Form("")):
+        """
+        批量渲染。jobs 为 JSON 数组，每项包含 image（images 中的下标，默认 0）以及
+        effect、format、duration_sec、fps 等参数；为空时对每张图片各渲染一次，参数取默认值（effect 必填）。
+        排队满时暂缓提交，待前面的任务完成后继续，所有任务共用一个连接。
+        """
+        sources = [_read_image(upload.file.read()) for upload in images]
+        try:
+            specs = json.loads(jobs) if jobs else [{"image": index} for index in range(len(sources))]
+        except json.JSONDecodeError as exc:
+            raise HTTPException(400, f"jobs 不是合法的 JSON: {exc}")
+        if not isinstance(specs, list) or not 0 < len(specs) <= MAX_BATCH_JOBS:
+            raise HTTPException(400, f"jobs 应为包含 1 到 {MAX_BATCH_JOBS} 项的数组")
+
+        requests = []
+        for spec in specs:
+            if not isinstance(spec, dict):
+                raise HTTPException(400, f"无效的任务参数: {spec}")
+            spec = dict(spec)
+            index = spec.pop("image", 0)
+            if not isinstance(index, int) or not 0 <= index < len(sources):
+                raise HTTPException(400, f"image 下标越界: {index}")
+            spec["fmt"] = spec.pop("format", "GIF")
+            try:
+                request = RenderRequest(sources[index], **spec)
+            except TypeError as exc:
+                raise HTTPException(400, f"无效的任务参数: {exc}")
+            # 任一任务超出预算时整批拒绝，不开始任何渲染
+            request.apply_budget(budget)
+            requests.append(request)
+        boundary = uuid.uuid4().hex
+
+        def parts() -> Iterator[bytes]:
+            waiting = list(enumerate(requests))
+            running: List[Tuple[int, Job]] = []
+            try:
+                while waiting or running:
+                    # 按队列余量逐步提交，已提交的任务都标记为仍在关注
+                    while waiting:
+                        try:
+                            job = queue_job(waiting[0][1])
+                        except QueueFull:
+                            break
+                        registry.add(job)
+                        running.append((waiting.pop(0)[0], job))
+                    for _, job in running:
+                        job.touch()
+                    if running:
+                        running[0][1].wait(POLL_INTERVAL_SEC)
+                    else:
+                        time.sleep(POLL_INTERVAL_SEC)
+
+                    for item in [item for item in running if item[1].done]:
+                        running.remove(item)
+                        yield _part(boundary, *item)
+                yield f"--{boundary}--\r\n".encode()
+            finally:
+                for _, job in running:
+                    job.cancel()
+
+        return StreamingResponse(parts(), media_type=f"multipart/mixed; boundary={boundary}")
+
+    return api
+
+
+def _part(boundary: str, index: int, job: Job) -> bytes:
+    """multipart/mixed 中的一个分段：成功时为编码数据，否则为 JSON 格式的任务信息"""
+    if job.status == DONE:
+        body, mime = job.result
+    else:
+        body, mime = json.dumps(_job_info(job), ensure_ascii=False).encode(), "application/json"
+    headers = (f"--{boundary}\r\nContent-Type: {mime}\r\nContent-Length: {len(body)}\r\n"
+               f"X-Job-Index: {index}\r\nX-Job-Id: {job.id}\r\nX-Job-Status: {job.status}\r\n\r\n")
+    return headers.encode() + body + b"\r\n"
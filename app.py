@@ -1,140 +1,179 @@
 """图像动画实验室
-提供基本的图像动画效果（翻转、平移、旋转），可生成 GIF 或 MP4。
+提供基本的图像动画效果（翻转、平移、旋转），可生成 GIF、MP4、WebM、WebP 或 APNG。
 前端使用 Gradio 构建。
 """
 
 import io
 import os
+import threading
 import time
 import io
-import tempfile
 from pathlib import Path
-from io import BytesIO
-from typing import Tuple
+from typing import Callable, Dict, Optional, Tuple
 
-import numpy as np
-import imageio
 from PIL import Image
 import gradio as gr
-
-from animations.appear import fade_in, slide_in_from_left, slide_in_from_top, zoom_in
-from animations.disappear import fade_out, slide_out_to_right, slide_out_to_bottom, zoom_out
-from animations.emphasis import pulse, shake, bounce, spin, tada, flash, swing
-
-EFFECTS = {
-    # 入场效果
-    "淡入": fade_in,
-    "滑入": slide_in_from_left,
-    "顶部滑入": slide_in_from_top,
-    "放大出现": zoom_in,
-    # 消失效果
-    "淡出": fade_out,
-    "滑出": slide_out_to_right,
-    "底部滑出": slide_out_to_bottom,
-    "缩小消失": zoom_out,
-    # 强调效果
-    "脉冲": pulse,
-    "摇晃": shake,
-    "弹跳": bounce,
-    "旋转": spin,
-    "惊喜": tada,
-    "闪烁": flash,
-    "摆动": swing
-}
-
-# -------------- 核心处理 -------------- #
-
-def make_animation(img: Image.Image, effect_name: str, fmt: str, duration_sec: float = 1.0, fps: int = 15) -> Tuple[bytes, str]:
-    """
-    根据选择的效果生成动画，并返回指定格式的数据。
-    
-    Args:
-        img: 输入图像
-        effect_name: 效果名称
-        fmt: 输出格式 ("GIF" 或 "MP4")
-        duration_sec: 动画持续时间（秒）
-        fps: 每秒帧数
-        
-    Returns:
-        动画数据和MIME类型
-    """
-    # 获取对应的效果函数
-    effect_fn = EFFECTS.get(effect_name)
-    if effect_fn is None:
-        return None, None
-
-    # 确保输入图像是高质量的RGBA模式
-    img_rgba = img.convert("RGBA")
-
-    # 计算总帧数并生成动画帧
-    num_frames = int(duration_sec * fps)
-    frames = effect_fn(img_rgba, num_frames=num_frames)
-
-    # 创建一个内存缓冲区来存储动画
-    buffer = BytesIO()
-
-    if fmt == "GIF":
-        # 计算每帧延迟（秒）
-        frame_delay = duration_sec / len(frames)
-
-        # 保存为GIF，移除特定的quantizer以使用Pillow的默认设置，可能提升画质
-        imageio.mimsave(buffer, frames, format="GIF", duration=frame_delay)
-        return buffer.getvalue(), "image/gif"
-    else:  # MP4
-        # 将PIL图像转换为numpy数组
-        np_frames = [np.array(frame) for frame in frames]
-
-        # 创建临时文件来存储MP4
-        with tempfile.NamedTemporaryFile(suffix=".mp4", delete=False) as temp_file:
-            temp_path = temp_file.name
-
-        # 保存为MP4
-        imageio.mimsave(temp_path, np_frames, format="mp4", fps=fps, codec="libx264", quality=8, pixelformat="yuv420p", macro_block_size=1)
-
-        # 读取生成的MP4文件
-        with open(temp_path, "rb") as f:
-            data = f.read()
-
-        # 删除临时文件
-        try:
-            os.unlink(temp_path)
-        except:
-            pass
-
-        return data, "video/mp4"
+import uvicorn
+
+from animations import framestore, parallel
+from animations.registry import CATEGORIES, EFFECTS, effects_by_category
+from api import build_api
+from core import metrics as render_metrics
+from core.metrics import RenderMetrics
+from core.cache import SUFFIXES
+from core.cost import DOWNGRADE, REJECT, Budget, admit
+from core.jobs import CANCELLED, FAILED, QUEUED, Job, JobQueue, QueueFull
+from core.pipeline import MAX_OUTPUT_LIMIT, MAX_OUTPUT_SIZE, RenderCancelled, make_animation, make_preview, normalize_format
+from core.storage import OutputStore
+
+# 输出文件存储，后台定期清理旧文件
+OUTPUT_STORE = OutputStore()
+
+# 渲染预算：单个任务的预测耗时、内存上限，以及同时运行的任务的内存总预算（见 core.cost.Budget.from_env）
+RENDER_BUDGET = Budget.from_env()
+# 完整渲染的任务队列：工作线程数与 CPU 核数一致，排队任务数有上限
+JOB_QUEUE = JobQueue(workers=os.cpu_count() or 1, max_pending=int(os.environ.get("RENDER_QUEUE_SIZE", "16")),
+                     memory_budget=RENDER_BUDGET.memory_bytes)
+# 向界面推送渲染进度的间隔（秒）
+PROGRESS_INTERVAL_SEC = 0.25
+
+# 每个会话最新一次预览请求的序号；设置变化后，仍在渲染的旧预览在下一帧前发现已过期并停止
+_preview_generations: Dict[str, int] = {}
+_preview_lock = threading.Lock()
 
 
 # -------------- Gradio 界面 -------------- #
 
-def interface_fn(img: Image.Image, effect_name: str, output_fmt: str, duration_sec: float, fps: int):
-    """处理用户输入并生成动画。"""
+def render_to_file(img: Image.Image, effect_name: str, output_fmt: str, duration_sec: float, fps: int,
+                   max_size: int = MAX_OUTPUT_SIZE, quality: int = 80, lossless: bool = False,
+                   video_profile: str = "default", threads: int = 0,
+                   on_frame: Optional[Callable[[int, int], None]] = None) -> Tuple[Path, str]:
+    """生成动画并写入输出文件，返回文件路径和 MIME 类型。"""
+    # 只生成用户选择的输出格式，指标覆盖生成和写文件两个阶段
+    metrics = RenderMetrics()
+    try:
+        data, mime = make_animation(img, effect_name, output_fmt, duration_sec=duration_sec, fps=fps,
+                                    metrics=metrics, max_size=int(max_size), quality=int(quality),
+                                    lossless=bool(lossless), video_profile=video_profile,
+                                    threads=int(threads) or None, on_frame=on_frame)
+
+        # 每个请求写入唯一的文件名，并发请求之间不会互相覆盖
+        with metrics.stage("store"):
+            output_path = OUTPUT_STORE.save(data, SUFFIXES[mime])
+    except Exception as exc:
+        metrics.error = metrics.error or f"{type(exc).__name__}: {exc}"
+        raise
+    finally:
+        render_metrics.emit(metrics)
+    return output_path, mime
+
+
+def _progress_text(job: Job) -> str:
+    if job.status == QUEUED:
+        return "排队中…"
+    if job.total_frames and job.encoded >= job.total_frames:
+        # 所有帧都已送入编码器，视频还要等 ffmpeg 写完缓冲的帧
+        return f"收尾中：{job.total_frames} 帧已全部送入编码器，正在写出文件…"
+    return f"渲染中：已渲染 {job.rendered}/{job.total_frames} 帧，已送入编码器 {job.encoded}/{job.total_frames} 帧"
+
+
+def interface_fn(img: Image.Image, effect_name: str, output_fmt: str, duration_sec: float, fps: int,
+                 max_size: int = MAX_OUTPUT_SIZE, quality: int = 80, lossless: bool = False,
+                 video_profile: str = "default", threads: int = 0):
+    """
+    处理用户输入并生成动画。
+
+    渲染作为任务提交到 JOB_QUEUE，本函数逐步产出 (GIF/图片输出, 视频输出, 进度文本, 任务编号)。
+    用户取消或断开连接时生成器被关闭，任务随之取消；无人轮询的任务也会被队列判定为放弃。
+    """
     if img is None:
-        return None, None
-    
-    # 获取选择的动画效果函数
-    effect_fn = EFFECTS.get(effect_name)
-    if effect_fn is None:
-        return None, None
-    
-    # 计算总帧数
-    num_frames = int(duration_sec * fps)
-    
-    # 只生成用户选择的输出格式
-    data, mime = make_animation(img, effect_name, output_fmt, duration_sec=duration_sec, fps=fps)
+        yield None, None, "", None
+        return
     
-    # 使用固定文件名保存输出
-    output_dir = Path("outputs")
-    output_dir.mkdir(exist_ok=True)
+    # 未知的效果不提交任务
+    if effect_name not in EFFECTS:
+        yield None, None, "", None
+        return
     
-    # 每个格式使用固定文件名
-    if output_fmt == "GIF":
-        output_path = output_dir / "animation.gif"
-        output_path.write_bytes(data)
-        return output_path.as_posix(), None
-    else:  # MP4
-        output_path = output_dir / "animation.mp4"
-        output_path.write_bytes(data)
-        return None, output_path.as_posix()
+    # 开始渲染前按预测成本决定接受、降级或拒绝
+    admission = admit(img.size, effect_name, normalize_format(output_fmt), duration_sec, fps, max_size,
+                      RENDER_BUDGET)
+    if admission.action == REJECT:
+        raise gr.Error(f"任务超出渲染预算：{admission.reason}，请缩短时长、降低帧率或分辨率")
+    max_size, fps = admission.max_size, admission.fps
+    note = ""
+    if admission.action == DOWNGRADE:
+        note = f"（{admission.reason}，已降级为最大分辨率 {max_size}、{fps} fps）"
+
+    def run(job: Job) -> Tuple[Path, str]:
+        return render_to_file(img, effect_name, output_fmt, duration_sec, fps, max_size, quality, lossless,
+                              video_profile, threads, on_frame=job.report)
+
+    try:
+        job = JOB_QUEUE.submit(run, total_frames=admission.cost.frames, memory_bytes=admission.cost.peak_bytes)
+    except QueueFull:
+        raise gr.Error("当前排队的任务过多，请稍后再试")
+
+    try:
+        yield gr.update(), gr.update(), _progress_text(job) + note, job.id
+        while not job.wait(PROGRESS_INTERVAL_SEC):
+            yield gr.update(), gr.update(), _progress_text(job) + note, job.id
+    finally:
+        if not job.done:
+            job.cancel()
+
+    if job.status == FAILED:
+        raise gr.Error(f"生成失败：{job.error}")
+    if job.status == CANCELLED:
+        yield gr.update(), gr.update(), "已取消", None
+        return
+
+    output_path, mime = job.result
+    elapsed = job.finished - job.created
+    status = f"完成：{job.total_frames} 帧，用时 {elapsed:.1f} 秒" + note
+    if mime.startswith("video/"):
+        yield None, output_path.as_posix(), status, None
+    else:  # GIF / WebP / APNG 都以图片显示
+        yield output_path.as_posix(), None, status, None
+
+
+def cancel_fn(job_id: Optional[int]) -> str:
+    """取消正在排队或渲染的任务"""
+    job = JOB_QUEUE.get(job_id) if job_id is not None else None
+    if job is None:
+        return "没有正在进行的任务"
+    job.cancel()
+    return "已取消"
+
+
+def preview_fn(img: Image.Image, effect_name: str, duration_sec: float, fps: int, request: gr.Request = None):
+    """设置变化时生成低分辨率预览，并取消同一会话中仍在进行的旧预览。"""
+    session = request.session_hash if request is not None else ""
+    with _preview_lock:
+        generation = _preview_generations.get(session, 0) + 1
+        _preview_generations[session] = generation
+
+    if img is None or effect_name not in EFFECTS:
+        return gr.update(), gr.update()
+
+    def check_current(_rendered: int, _encoded: int) -> None:
+        if _preview_generations.get(session) != generation:
+            raise RenderCancelled()
+
+    try:
+        data, mime = make_preview(img, effect_name, duration_sec, fps, on_frame=check_current)
+    except RenderCancelled:
+        # 已有更新的预览请求，保持界面不变
+        return gr.update(), gr.update()
+    output_path = OUTPUT_STORE.save(data, SUFFIXES[mime])
+    return output_path.as_posix(), gr.update(selected="preview_tab")
+
+
+def forget_preview_session(request: gr.Request = None):
+    """会话结束时移除其预览序号"""
+    if request is not None:
+        with _preview_lock:
+            _preview_generations.pop(request.session_hash, None)
 
 
 def build_interface():
@@ -159,21 +198,15 @@ def build_interface():
     with gr.Blocks(theme=gr.themes.Default(), css=custom_css) as demo:
         gr.Markdown("# 图像动画实验室")
 
-        # 定义动画效果
-        appear_effects = ["淡入", "滑入", "顶部滑入", "放大出现"]
-        disappear_effects = ["淡出", "滑出", "底部滑出", "缩小消失"]
-        emphasis_effects = ["脉冲", "摇晃", "弹跳", "旋转", "惊喜", "闪烁", "摆动"]
-        all_effects_grouped = {
-            "出现效果": appear_effects,
-            "消失效果": disappear_effects,
-            "强调效果": emphasis_effects,
-        }
+        # 动画效果按注册表中的分类分组
+        all_effects_grouped = effects_by_category()
+        appear_effects = all_effects_grouped[CATEGORIES["appear"]]
         
         # 1. 输入和输出在同一行
         with gr.Row(equal_height=True):
             # 左侧：描述 + 输入图像
             with gr.Column(scale=1):
-                gr.Markdown("上传图片，选择动画效果，生成 GIF 或 MP4 动画。")
+                gr.Markdown("上传图片，选择动画效果，生成 GIF、MP4、WebM、WebP 或 APNG 动画。")
                 inp_img = gr.Image(
                     show_label=False,
                     type="pil",
@@ -187,7 +220,16 @@ def build_interface():
             # 右侧：输出结果
             with gr.Column(scale=1):
                 with gr.Tabs() as output_tabs:
-                    with gr.TabItem("GIF动画", id="gif_tab") as gif_tab:
+                    with gr.TabItem("快速预览", id="preview_tab"):
+                        preview_output = gr.Image(
+                            show_label=False,
+                            type="filepath",
+                            interactive=False,
+                            elem_classes="image-container",
+                            elem_id="preview-output"
+                        )
+
+                    with gr.TabItem("GIF/WebP/APNG动画", id="gif_tab") as gif_tab:
                         gif_output = gr.Image(
                             show_label=False,
                             type="filepath",
@@ -197,7 +239,7 @@ def build_interface():
                             elem_id="gif-output"
                         )
                     
-                    with gr.TabItem("MP4动画", id="mp4_tab") as mp4_tab:
+                    with gr.TabItem("MP4/WebM动画", id="mp4_tab") as mp4_tab:
                         video_output = gr.Video(
                             show_label=False,
                             autoplay=True,
@@ -233,8 +275,22 @@ def build_interface():
                 with gr.Group():
                     gr.Markdown("**输出设置**")
                     output_fmt = gr.Radio(
-                        label="格式", choices=["GIF", "MP4"], value="GIF"
+                        label="格式", choices=["GIF", "MP4", "WebM", "WebP", "APNG"], value="GIF"
+                    )
+                    video_profile = gr.Radio(
+                        label="视频编码档位（MP4 / WebM）",
+                        choices=[("预览（最快）", "preview"), ("默认", "default"), ("最终（最小）", "final")],
+                        value="default"
+                    )
+                    threads = gr.Slider(
+                        minimum=0, maximum=16, value=0, step=1,
+                        label="视频编码线程数（0 为自动）"
                     )
+                    quality = gr.Slider(
+                        minimum=0, maximum=100, value=80, step=1,
+                        label="WebP 质量（无损时为压缩力度）"
+                    )
+                    lossless = gr.Checkbox(label="WebP 无损", value=False)
                     duration = gr.Slider(
                         minimum=0.5, maximum=5.0, value=1.0, step=0.1, 
                         label="持续时间（秒）"
@@ -243,9 +299,17 @@ def build_interface():
                         minimum=10, maximum=60, value=20, step=1, 
                         label="帧率（FPS）"
                     )
+                    max_size = gr.Slider(
+                        minimum=128, maximum=MAX_OUTPUT_LIMIT, value=MAX_OUTPUT_SIZE, step=64,
+                        label="最大分辨率（长边像素）"
+                    )
         
-        # 3. 生成按钮 - 作为最终操作
-        btn = gr.Button("生成动画", variant="primary", size="lg")
+        # 3. 生成按钮 - 作为最终操作，渲染过程中可以取消
+        with gr.Row():
+            btn = gr.Button("生成动画", variant="primary", size="lg", scale=4)
+            cancel_btn = gr.Button("取消", variant="stop", size="lg", scale=1)
+        job_status = gr.Markdown()
+        job_id = gr.State(None)
 
         # --- 事件处理逻辑 ---
         def update_effect_choices(effect_type):
@@ -259,21 +323,39 @@ def build_interface():
         )
 
         def switch_tab(fmt):
-            return gr.update(selected="gif_tab" if fmt == "GIF" else "mp4_tab")
+            return gr.update(selected="mp4_tab" if fmt in ("MP4", "WebM") else "gif_tab")
 
         output_fmt.change(fn=switch_tab, inputs=output_fmt, outputs=output_tabs)
         
-        btn.click(
+        # 渲染任务自带有界队列，这里不再限制并发，排队中的请求也能显示进度
+        render_event = btn.click(
             fn=interface_fn, 
-            inputs=[inp_img, effect_dropdown, output_fmt, duration, fps], 
-            outputs=[gif_output, video_output]
-        ).then(fn=switch_tab, inputs=output_fmt, outputs=output_tabs)
+            inputs=[inp_img, effect_dropdown, output_fmt, duration, fps, max_size, quality, lossless,
+                    video_profile, threads], 
+            outputs=[gif_output, video_output, job_status, job_id],
+            concurrency_limit=None,
+            show_progress="minimal",
+        )
+        render_event.then(fn=switch_tab, inputs=output_fmt, outputs=output_tabs)
+        cancel_btn.click(fn=cancel_fn, inputs=job_id, outputs=job_status, cancels=[render_event])
+
+        # 效果、时长、帧率或图片变化时生成低分辨率预览；完整渲染只在点击按钮时进行。
+        # 每次变化都立即提交（multiple），由 preview_fn 取消同一会话中过期的预览
+        gr.on(
+            triggers=[inp_img.change, effect_dropdown.change, duration.change, fps.change],
+            fn=preview_fn,
+            inputs=[inp_img, effect_dropdown, duration, fps],
+            outputs=[preview_output, output_tabs],
+            trigger_mode="multiple",
+            show_progress="minimal",
+        )
+        demo.unload(forget_preview_session)
 
         # --- 示例 ---
         if os.path.exists("examples"):
             import random
             example_images = [os.path.join("examples", f) for f in os.listdir("examples") if f.lower().endswith(('.jpg', '.jpeg', '.png'))]
-            all_effects = appear_effects + disappear_effects + emphasis_effects
+            all_effects = list(EFFECTS)
 
             def find_effect_type(effect_name):
                 for type_name, effects in all_effects_grouped.items():
@@ -285,13 +367,15 @@ def build_interface():
             for img_path in example_images:
                 random_effect = random.choice(all_effects)
                 effect_type = find_effect_type(random_effect)
-                random_fmt = random.choice(["GIF", "MP4"])
+                random_fmt = random.choice(["GIF", "MP4", "WebM", "WebP", "APNG"])
                 random_duration = round(random.uniform(0.5, 5.0), 1)
                 random_fps = random.randint(10, 60)
                 example_data.append([img_path, effect_type, random_effect, random_fmt, random_duration, random_fps])
             
             def example_fn(img, effect_type, effect, fmt, dur, frame_rate):
-                gif_result, video_result = interface_fn(img, effect, fmt, dur, frame_rate)
+                # 取最后一次产出的结果，中间的进度更新无需显示
+                for gif_result, video_result, _status, _job_id in interface_fn(img, effect, fmt, dur, frame_rate):
+                    pass
                 tab_update = switch_tab(fmt)
                 # 当点击示例时，不仅要更新具体效果的值，还要更新它的选项列表
                 effect_dropdown_update = gr.update(choices=all_effects_grouped[effect_type], value=effect)
@@ -316,8 +400,21 @@ def build_interface():
 def main():
     # 禁用 Gradio 的分析数据收集，避免网络问题导致的错误
     os.environ['GRADIO_ANALYTICS_ENABLED'] = 'False'
+    # 设置 RENDER_WORKERS 后，旋转、缩放类效果的帧在进程池中并行渲染
+    parallel.configure(int(os.environ.get("RENDER_WORKERS", "0")))
+    # 设置 FRAME_SCRATCH_DIR 后，超出 FRAME_MEMORY_LIMIT_MB 的待复用帧写入该目录下的临时 memmap 文件
+    if "FRAME_SCRATCH_DIR" in os.environ:
+        framestore.configure(os.environ["FRAME_SCRATCH_DIR"],
+                             int(os.environ.get("FRAME_MEMORY_LIMIT_MB", "256")) * 1024 * 1024)
+    # 设置 ANIMATION_METRICS（如 "log,jsonl:metrics.jsonl,prom:animation.prom"）后上报渲染指标
+    render_metrics.configure_from_env()
     demo = build_interface()
-    demo.launch()
+    # 输出文件名按请求唯一，可以放开并发，充分利用多核
+    demo.queue(default_concurrency_limit=os.cpu_count() or 1)
+    # HTTP 渲染 API（/v1/...）与界面共用同一个服务和渲染任务队列，界面挂载在根路径
+    app = gr.mount_gradio_app(build_api(JOB_QUEUE, RENDER_BUDGET), demo, path="/")
+    uvicorn.run(app, host=os.environ.get("GRADIO_SERVER_NAME", "127.0.0.1"),
+                port=int(os.environ.get("GRADIO_SERVER_PORT", "7860")))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,113 @@
+"""图像动画实验室 - 批量渲染命令行
+对目录或清单中的图片批量生成动画，不加载 Gradio 界面。
+
+示例：
+    python batch.py examples/ --effects 淡入,旋转 --formats GIF,MP4 --fps 15,30 --workers 4
+    python batch.py jobs.jsonl --output-dir batch_outputs
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+from animations import framestore, parallel
+from core.batch import BatchSpec, JobResult, find_images, load_manifest, run_batch
+from core.cache import AnimationCache
+from core.encoders import VIDEO_PROFILES
+from core.pipeline import EFFECTS, FORMATS, MAX_OUTPUT_SIZE
+
+
+def _split(value: str, cast=str):
+    return [cast(item.strip()) for item in value.split(",") if item.strip()]
+
+
+def _formats(value: str):
+    formats = _split(value)
+    unknown = [fmt for fmt in formats if fmt.upper() not in FORMATS]
+    if unknown:
+        raise argparse.ArgumentTypeError(f"未知的输出格式: {', '.join(unknown)}；可选: {', '.join(FORMATS)}")
+    return formats
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="批量生成图像动画")
+    parser.add_argument("source", type=Path, help="图片目录，或 JSON Lines 格式的任务清单")
+    parser.add_argument("--effects", type=_split, default=list(EFFECTS),
+                        help="逗号分隔的效果名称，默认全部效果")
+    parser.add_argument("--formats", type=_formats, default=["GIF"], help="逗号分隔的输出格式 (GIF/MP4/WebM/WebP/APNG)")
+    parser.add_argument("--durations", type=lambda v: _split(v, float), default=[1.0], help="逗号分隔的持续时间（秒）")
+    parser.add_argument("--fps", type=lambda v: _split(v, int), default=[15], help="逗号分隔的帧率")
+    parser.add_argument("--output-dir", type=Path, default=Path("batch_outputs"), help="输出目录")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="并行任务数")
+    parser.add_argument("--render-workers", type=int, default=0,
+                        help="旋转、缩放类效果的渲染进程数，0 表示不使用进程池")
+    parser.add_argument("--cache", action="store_true", help="使用结果缓存，跳过已生成过的组合")
+    parser.add_argument("--max-size", type=int, default=MAX_OUTPUT_SIZE,
+                        help="输出的最大长边（像素），更大的图片先缩小再渲染；0 表示不限制")
+    parser.add_argument("--scratch-dir", default=None,
+                        help="超大图片或长动画的待复用帧写入该目录下的临时 memmap 文件，限制常驻内存")
+    parser.add_argument("--frame-memory-mb", type=int, default=256,
+                        help="配合 --scratch-dir：每个任务待复用帧的内存上限（MB），超出时写入磁盘")
+    parser.add_argument("--video-profile", choices=list(VIDEO_PROFILES), default="default",
+                        help="MP4 / WebM 的编码档位：preview 最快，final 文件最小")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+
+    unknown = [name for name in args.effects if name not in EFFECTS]
+    if unknown:
+        print(f"未知的效果: {', '.join(unknown)}；可选: {', '.join(EFFECTS)}", file=sys.stderr)
+        return 2
+
+    defaults = BatchSpec(image="", effects=args.effects, formats=args.formats,
+                         durations=args.durations, fps=args.fps)
+    if args.source.is_dir():
+        specs = [BatchSpec(str(path), defaults.effects, defaults.formats, defaults.durations, defaults.fps)
+                 for path in find_images(args.source)]
+    else:
+        specs = load_manifest(args.source, defaults)
+        unknown = sorted({fmt for spec in specs for fmt in spec.formats if str(fmt).upper() not in FORMATS})
+        if unknown:
+            print(f"清单中有未知的输出格式: {', '.join(unknown)}；可选: {', '.join(FORMATS)}", file=sys.stderr)
+            return 2
+
+    parallel.configure(args.render_workers)
+    if args.scratch_dir is not None:
+        framestore.configure(args.scratch_dir, args.frame_memory_mb * 1024 * 1024)
+    args.output_dir.mkdir(parents=True, exist_ok=True)
+
+    def report(result: JobResult) -> None:
+        job = result.job
+        status = result.error or f"{result.bytes} bytes"
+        print(f"[{result.render_sec:7.2f}s] {job.image} {job.effect} {job.fmt} "
+              f"{job.duration_sec:g}s@{job.fps}fps -> {status}", flush=True)
+
+    start = time.perf_counter()
+    try:
+        results = run_batch(specs, args.output_dir, workers=args.workers,
+                            cache=AnimationCache() if args.cache else None, max_size=args.max_size,
+                            video_profile=args.video_profile, on_result=report)
+    finally:
+        parallel.shutdown()
+    elapsed = time.perf_counter() - start
+
+    failed = [result for result in results if result.error]
+    summary = {
+        "jobs": len(results),
+        "failed": len(failed),
+        "wall_sec": round(elapsed, 3),
+        "results": [result.to_dict() for result in results],
+    }
+    summary_path = args.output_dir / "summary.json"
+    summary_path.write_text(json.dumps(summary, ensure_ascii=False, indent=2), encoding="utf-8")
+    print(f"完成 {len(results)} 个任务（失败 {len(failed)} 个），用时 {elapsed:.2f}s，汇总见 {summary_path}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,232 @@
+"""
+动画生成基准测试
+对注册表中的每个效果，在 图像尺寸 × 帧数 × 输出格式 的组合上测量
+各阶段耗时（RGBA 转换、帧渲染、编码）、峰值内存和帧率，结果输出为 JSON，
+便于在不同提交之间对比、发现性能回退。
+
+用法（在仓库根目录执行）：
+    python -m benchmarks.bench_animation --out bench.json
+    python -m benchmarks.bench_animation --effects 旋转,惊喜 --sizes 512,1024 --frames 30 --formats GIF
+    python -m benchmarks.bench_animation --sizes 512,1024 --frames 60 --formats GIF,MP4,WebM,WebP,APNG --no-examples --calibrate core/cost_model.json
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+import PIL
+from PIL import Image
+
+from core.cost import calibrate
+from core.metrics import RenderMetrics, current_rss
+from core.pipeline import EFFECTS, make_animation
+
+ROOT = Path(__file__).resolve().parent.parent
+EXAMPLES_DIR = ROOT / "examples"
+
+
+def synthetic_image(size: int, seed: int = 0) -> Image.Image:
+    """生成可复现的合成测试图：渐变叠加噪声，四角透明，覆盖 alpha 相关路径"""
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:size, 0:size].astype(np.float32) / max(size - 1, 1)
+    rgba = np.empty((size, size, 4), np.uint8)
+    rgba[..., 0] = 255 * x
+    rgba[..., 1] = 255 * y
+    rgba[..., 2] = 255 * (1 - x) * (1 - y)
+    rgba[..., :3] = np.clip(rgba[..., :3] + rng.integers(-20, 20, (size, size, 3)), 0, 255)
+    radius = np.hypot(x - 0.5, y - 0.5)
+    rgba[..., 3] = np.where(radius < 0.6, 255, 0)
+    return Image.fromarray(rgba, "RGBA")
+
+
+def source_images(sizes: List[int], use_examples: bool, quick: bool = False) -> Dict[str, Image.Image]:
+    """按最长边缩放 examples/*.jpg 并生成合成图片，返回 名称 -> 图像；quick 时只取第一张示例图片"""
+    images = {}
+    examples = sorted(EXAMPLES_DIR.glob("*.jpg")) if use_examples else []
+    if quick:
+        examples = examples[:1]
+    for size in sizes:
+        images[f"synthetic@{size}"] = synthetic_image(size)
+        for path in examples:
+            with Image.open(path) as opened:
+                img = opened.convert("RGB")
+            scale = size / max(img.size)
+            img = img.resize((max(1, round(img.width * scale)), max(1, round(img.height * scale))), Image.LANCZOS)
+            images[f"{path.stem}@{size}"] = img
+    return images
+
+
+def children_rss() -> int:
+    """子进程（如 ffmpeg 编码器）的常驻内存之和，仅 Linux 可用，其他平台返回 0"""
+    total = 0
+    try:
+        threads = os.listdir("/proc/self/task")
+    except OSError:
+        return 0
+    for tid in threads:
+        try:
+            with open(f"/proc/self/task/{tid}/children") as f:
+                pids = f.read().split()
+        except OSError:
+            continue
+        for pid in pids:
+            try:
+                with open(f"/proc/{pid}/statm") as f:
+                    total += int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+            except (OSError, ValueError):
+                continue
+    return total
+
+
+class RSSSampler:
+    """后台线程周期性采样本进程及其子进程（ffmpeg 编码器）的常驻内存，记录区间内的峰值"""
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    @staticmethod
+    def current() -> int:
+        rss = current_rss()
+        if rss:
+            return rss + children_rss()
+        # 非 Linux 平台退化为进程生命周期内的峰值
+        usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return usage if sys.platform == "darwin" else usage * 1024
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self.peak = max(self.peak, self.current())
+            self._stop.wait(self.interval)
+
+    def __enter__(self) -> "RSSSampler":
+        self.baseline = self.current()
+        self.peak = self.baseline
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, self.current())
+
+
+def run_case(img: Image.Image, effect_name: str, fmt: str, num_frames: int, fps: int) -> Dict:
+    """运行单个用例（不使用结果缓存、不限制分辨率），返回各阶段耗时与内存统计"""
+    metrics = RenderMetrics()
+    duration_sec = num_frames / fps
+    with RSSSampler() as rss:
+        start = time.perf_counter()
+        data, _ = make_animation(img, effect_name, fmt, duration_sec, fps, cache=None, metrics=metrics,
+                                 max_size=None)
+        total_sec = time.perf_counter() - start
+
+    stages = metrics.stages
+    render_encode_sec = stages.get("render", 0.0) + stages.get("encode", 0.0)
+    return {
+        "frames": metrics.frames,
+        "convert_sec": round(stages.get("convert", 0.0), 6),
+        "render_sec": round(stages.get("render", 0.0), 6),
+        "encode_sec": round(stages.get("encode", 0.0), 6),
+        "total_sec": round(total_sec, 6),
+        "frames_per_sec": round(metrics.frames / render_encode_sec, 3) if render_encode_sec > 0 else None,
+        "bytes_out": len(data),
+        "peak_rss_bytes": rss.peak,
+        "peak_rss_delta_bytes": rss.peak - rss.baseline,
+    }
+
+
+def run_isolated(img: Image.Image, effect_name: str, fmt: str, num_frames: int, fps: int) -> Dict:
+    """
+    在新启动的进程中运行单个用例。
+
+    同一进程内先前用例释放的堆内存会被后续用例复用，常驻内存增量因此偏小甚至为 0；
+    每个用例在干净的解释器中运行，测得的峰值内存增量才能用于标定成本模型
+    """
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(1, mp_context=context) as pool:
+        return pool.submit(run_case, img, effect_name, fmt, num_frames, fps).result()
+
+
+def environment() -> Dict:
+    """记录运行环境，便于跨提交对比"""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+        "pillow": PIL.__version__,
+    }
+
+
+def _split(value: str, cast=str):
+    return [cast(item.strip()) for item in value.split(",") if item.strip()]
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="动画生成基准测试")
+    parser.add_argument("--effects", type=_split, default=list(EFFECTS), help="逗号分隔的效果名称，默认全部")
+    parser.add_argument("--sizes", type=lambda v: _split(v, int), default=[256, 512], help="图像最长边（像素）")
+    parser.add_argument("--frames", type=lambda v: _split(v, int), default=[15, 30], help="帧数")
+    parser.add_argument("--formats", type=_split, default=["GIF", "MP4"], help="输出格式")
+    parser.add_argument("--fps", type=int, default=15, help="帧率")
+    parser.add_argument("--repeat", type=int, default=1, help="每个用例重复次数，报告耗时最短的一次")
+    parser.add_argument("--in-process", action="store_true",
+                        help="在当前进程中依次运行所有用例（更快，但内存增量不可靠，不宜用于标定）")
+    parser.add_argument("--no-examples", action="store_true", help="只使用合成图片")
+    parser.add_argument("--quick", action="store_true", help="只使用第一张示例图片，快速检查回退")
+    parser.add_argument("--out", type=Path, help="JSON 结果输出路径，默认打印到标准输出")
+    parser.add_argument("--calibrate", type=Path,
+                        help="由结果标定成本模型并写入该 JSON 文件，供 RENDER_COST_MODEL 使用")
+    args = parser.parse_args(argv)
+
+    images = source_images(args.sizes, use_examples=not args.no_examples, quick=args.quick)
+    run = run_case if args.in_process else run_isolated
+    results = []
+    for image_name, img in images.items():
+        for effect_name in args.effects:
+            for num_frames in args.frames:
+                for fmt in args.formats:
+                    runs = [run(img, effect_name, fmt, num_frames, args.fps) for _ in range(max(1, args.repeat))]
+                    best = min(runs, key=lambda run: run["total_sec"])
+                    best.update({"image": image_name, "width": img.width, "height": img.height,
+                                 "effect": effect_name, "format": fmt, "requested_frames": num_frames,
+                                 "fps": args.fps})
+                    results.append(best)
+                    print(f"{image_name:>18} {effect_name:<6} {fmt:<4} {num_frames:>4}f "
+                          f"render {best['render_sec']:.3f}s encode {best['encode_sec']:.3f}s "
+                          f"{best['frames_per_sec']} fps", file=sys.stderr)
+
+    report = {"environment": environment(), "results": results}
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.out:
+        args.out.write_text(text, encoding="utf-8")
+    else:
+        print(text)
+    if args.calibrate:
+        model = calibrate(results)
+        args.calibrate.write_text(json.dumps(model.to_dict(), ensure_ascii=False, indent=2), encoding="utf-8")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
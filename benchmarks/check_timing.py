@@ -0,0 +1,91 @@
+"""
+输出时长一致性检查
+对 时长 × 帧率 的组合把同一效果编码为所有格式，读回各文件的帧数和总时长，
+确认所有格式都恰好播放请求的时长；任一组合不一致时以非零状态退出。
+
+用法（在仓库根目录执行）：
+    python -m benchmarks.check_timing
+    python -m benchmarks.check_timing --effect 惊喜 --cases 4.1x30,0.5x15,1.4x45
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+from io import BytesIO
+from typing import List, Tuple
+
+import imageio_ffmpeg
+from PIL import Image
+
+from core.pipeline import EFFECTS, FORMATS, _render_animation
+from core.timing import frame_count
+from benchmarks.bench_animation import synthetic_image
+
+# 默认检查的 (时长秒数, 帧率)：包括浮点乘积略小于整数、容易截断丢帧的组合
+DEFAULT_CASES = "4.1x30,0.5x15,1.4x45,2.3x50,1x15,2.5x24,3x60"
+# 允许的误差（毫秒）：GIF 延迟以 1/100 秒为单位，视频容器时间戳同样有取整
+TOLERANCE_MS = 10
+
+
+def parse_cases(text: str) -> List[Tuple[float, int]]:
+    cases = []
+    for item in text.split(","):
+        duration, fps = item.lower().split("x")
+        cases.append((float(duration), int(fps)))
+    return cases
+
+
+def animated_duration_ms(data: bytes) -> Tuple[int, float]:
+    """读取 GIF / WebP / APNG 的 (帧数, 总时长毫秒)"""
+    frames, total = 0, 0.0
+    with Image.open(BytesIO(data)) as im:
+        try:
+            while True:
+                im.load()
+                total += im.info.get("duration", 0)
+                frames += 1
+                im.seek(im.tell() + 1)
+        except EOFError:
+            pass
+    return frames, total
+
+
+def video_duration_ms(data: bytes, suffix: str) -> Tuple[int, float]:
+    """解码 MP4 / WebM，返回 (帧数, 总时长毫秒)"""
+    with tempfile.NamedTemporaryFile(suffix=suffix, delete=False) as file:
+        file.write(data)
+    try:
+        frames, seconds = imageio_ffmpeg.count_frames_and_secs(file.name)
+    finally:
+        os.unlink(file.name)
+    return frames, seconds * 1000
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--effect", default="惊喜", choices=list(EFFECTS))
+    parser.add_argument("--cases", default=DEFAULT_CASES, help="逗号分隔的 时长x帧率，如 4.1x30")
+    parser.add_argument("--size", type=int, default=64, help="合成测试图的边长")
+    args = parser.parse_args()
+
+    img = synthetic_image(args.size)
+    failed = False
+    for duration_sec, fps in parse_cases(args.cases):
+        expected = duration_sec * 1000
+        report = []
+        for fmt in FORMATS:
+            data, _ = _render_animation(img, EFFECTS[args.effect], fmt, duration_sec, fps)
+            if fmt in ("MP4", "WEBM"):
+                frames, total = video_duration_ms(data, f".{fmt.lower()}")
+            else:
+                frames, total = animated_duration_ms(data)
+            ok = abs(total - expected) <= TOLERANCE_MS
+            failed |= not ok
+            report.append(f"{fmt} {total:.0f}ms/{frames}帧{'' if ok else ' ✗'}")
+        print(f"{duration_sec}s × {fps}fps = {frame_count(duration_sec, fps)} 帧: " + ", ".join(report))
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,4 @@
+"""
+核心处理模块
+包含与界面无关的动画编码等功能
+"""
@@ -0,0 +1,123 @@
+"""
+APNG 编码
+逐帧写出 RGBA 帧，每帧只写出与上一帧不同的矩形区域（以 SOURCE 方式覆盖，透明度精确保留），
+连续的相同帧合并为一帧并累加延迟。像素数据的过滤和 zlib 压缩由 Pillow 的 PNG 编码器完成
+"""
+
+import struct
+import zlib
+from io import BytesIO
+from typing import List, Optional
+
+import numpy as np
+from PIL import Image
+
+from .gif import _bbox
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+# fcTL 中的处置方式与混合方式
+DISPOSE_OP_NONE = 0
+BLEND_OP_SOURCE = 0
+
+
+def _chunk(kind: bytes, data: bytes) -> bytes:
+    return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data) & 0xFFFFFFFF)
+
+
+def _idat_payloads(image: Image.Image, compress_level: int) -> List[bytes]:
+    """用 Pillow 把图像编码为 PNG，取出其中各 IDAT 块的数据"""
+    buffer = BytesIO()
+    image.save(buffer, "PNG", compress_level=compress_level)
+    data = buffer.getvalue()
+    payloads = []
+    pos = len(PNG_SIGNATURE)
+    while pos < len(data):
+        length, kind = struct.unpack(">I4s", data[pos:pos + 8])
+        if kind == b"IDAT":
+            payloads.append(data[pos + 8:pos + 8 + length])
+        pos += 12 + length
+    return payloads
+
+
+def _delay_fraction(delay_ms: int):
+    """fcTL 的延迟分子、分母都是 16 位整数，过长的延迟改用百分之一秒为单位"""
+    if delay_ms <= 0xFFFF:
+        return delay_ms, 1000
+    return min(round(delay_ms / 10), 0xFFFF), 100
+
+
+class ApngWriter:
+    """
+    增量 APNG 写入器。
+
+    帧数要写在文件头的 acTL 块中，因此帧数据先写入缓冲区，finish() 时再拼上文件头。
+    """
+
+    def __init__(self, loop: int = 1, compress_level: int = 6):
+        self.loop = loop
+        self.compress_level = compress_level
+        self._buffer = BytesIO()
+        self._screen: Optional[np.ndarray] = None
+        self._pending: Optional[np.ndarray] = None
+        self._pending_delay = 0
+        self._frames = 0
+        self._sequence = 0
+
+    def add(self, frame: np.ndarray, delay_ms: int) -> None:
+        """
+        添加一帧。
+
+        Args:
+            frame: (H, W, 4) 的 RGBA 帧
+            delay_ms: 显示时长（毫秒）
+        """
+        pending = self._pending
+        if pending is not None and (frame is pending or np.array_equal(frame, pending)):
+            self._pending_delay += delay_ms
+            return
+        if pending is not None:
+            self._flush()
+        self._pending = frame
+        self._pending_delay = delay_ms
+
+    def finish(self) -> bytes:
+        """写出最后一帧，返回完整的 APNG 数据"""
+        if self._pending is None:
+            raise ValueError("没有可编码的帧")
+        self._flush()
+        height, width = self._screen.shape[:2]
+        header = PNG_SIGNATURE
+        # 8 位深度，RGBA 颜色类型，无隔行
+        header += _chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 6, 0, 0, 0))
+        header += _chunk(b"acTL", struct.pack(">II", self._frames, self.loop))
+        return header + self._buffer.getvalue() + _chunk(b"IEND", b"")
+
+    def _next_sequence(self) -> int:
+        sequence = self._sequence
+        self._sequence += 1
+        return sequence
+
+    def _flush(self) -> None:
+        frame, screen = self._pending, self._screen
+        height, width = frame.shape[:2]
+        if screen is None:
+            # 首帧同时是默认图像，必须覆盖整个画布
+            box = (0, 0, width, height)
+        else:
+            changed = (frame != screen).any(axis=2)
+            box = _bbox(changed) or (0, 0, 1, 1)
+        left, top, right, bottom = box
+
+        patch = Image.fromarray(np.ascontiguousarray(frame[top:bottom, left:right]), "RGBA")
+        delay_num, delay_den = _delay_fraction(self._pending_delay)
+        self._buffer.write(_chunk(b"fcTL", struct.pack(
+            ">IIIIIHHBB", self._next_sequence(), right - left, bottom - top, left, top,
+            delay_num, delay_den, DISPOSE_OP_NONE, BLEND_OP_SOURCE)))
+        for payload in _idat_payloads(patch, self.compress_level):
+            if self._frames == 0:
+                self._buffer.write(_chunk(b"IDAT", payload))
+            else:
+                self._buffer.write(_chunk(b"fdAT", struct.pack(">I", self._next_sequence()) + payload))
+        self._frames += 1
+        self._screen = frame
@@ -0,0 +1,206 @@
+"""
+批量渲染
+对一批图片按 效果 × 格式 × 时长 × 帧率 的组合生成动画，不依赖 Gradio。
+每张源图只解码一次，由它的所有任务共享；任务在线程池中并行执行
+"""
+
+import hashlib
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from itertools import product
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from PIL import Image
+
+from .cache import SUFFIXES, AnimationCache
+from .pipeline import EFFECTS, MAX_OUTPUT_SIZE, limit_size, make_animation
+
+IMAGE_SUFFIXES = (".jpg", ".jpeg", ".png", ".webp", ".bmp")
+
+
+@dataclass
+class BatchJob:
+    """一个渲染任务：一张图片的一种参数组合"""
+    image: str
+    effect: str
+    fmt: str
+    duration_sec: float
+    fps: int
+
+
+@dataclass
+class JobResult:
+    """任务结果与耗时统计"""
+    job: BatchJob
+    output: Optional[str] = None
+    bytes: int = 0
+    decode_sec: float = 0.0
+    render_sec: float = 0.0
+    error: Optional[str] = None
+
+    def to_dict(self) -> Dict:
+        result = asdict(self.job)
+        result.update({key: value for key, value in asdict(self).items() if key != "job"})
+        return result
+
+
+@dataclass
+class BatchSpec:
+    """一张图片及其要生成的参数组合"""
+    image: str
+    effects: Sequence[str] = field(default_factory=lambda: list(EFFECTS))
+    formats: Sequence[str] = ("GIF",)
+    durations: Sequence[float] = (1.0,)
+    fps: Sequence[int] = (15,)
+
+    def jobs(self) -> List[BatchJob]:
+        return [BatchJob(self.image, effect, fmt, float(duration), int(fps))
+                for effect, fmt, duration, fps in product(self.effects, self.formats, self.durations, self.fps)]
+
+
+def find_images(directory: Path) -> List[Path]:
+    """列出目录下所有支持的图片文件（按文件名排序）"""
+    return sorted(path for path in directory.iterdir() if path.suffix.lower() in IMAGE_SUFFIXES)
+
+
+def load_manifest(path: Path, defaults: BatchSpec) -> List[BatchSpec]:
+    """
+    读取 JSON Lines 格式的任务清单。
+
+    每行一个对象，必须包含 "image"，可选 "effects"、"formats"、"durations"、"fps"
+    覆盖命令行给出的默认组合；相对路径相对于清单文件所在目录。
+    """
+    specs = []
+    for line in path.read_text(encoding="utf-8").splitlines():
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        entry = json.loads(line)
+        image = Path(entry["image"])
+        if not image.is_absolute():
+            image = path.parent / image
+        specs.append(BatchSpec(
+            image=str(image),
+            effects=entry.get("effects", defaults.effects),
+            formats=entry.get("formats", defaults.formats),
+            durations=entry.get("durations", defaults.durations),
+            fps=entry.get("fps", defaults.fps),
+        ))
+    return specs
+
+
+def output_dirs(images: Iterable[str]) -> Dict[str, str]:
+    """
+    每张源图的输出子目录名：通常为不含扩展名的文件名；
+    不同图片同名（如 a/x.png 与 b/x.png，或 x.png 与 x.jpg）时改为
+    <文件名>-<路径哈希>，各自的输出不会相互覆盖
+    """
+    images = list(dict.fromkeys(images))
+    stems: Dict[str, int] = {}
+    for image in images:
+        stem = Path(image).stem
+        stems[stem] = stems.get(stem, 0) + 1
+
+    dirs = {}
+    for image in images:
+        path = Path(image)
+        if stems[path.stem] == 1:
+            dirs[image] = path.stem
+        else:
+            digest = hashlib.sha1(str(path.resolve()).encode()).hexdigest()[:8]
+            dirs[image] = f"{path.name}-{digest}"
+    return dirs
+
+
+def output_path(output_dir: Path, source_dir: str, job: BatchJob, mime: str) -> Path:
+    """任务输出路径：<输出目录>/<源图子目录>/<效果>_<时长>s_<帧率>fps.<扩展名>，子目录名见 output_dirs"""
+    return output_dir / source_dir / f"{job.effect}_{job.duration_sec:g}s_{job.fps}fps{SUFFIXES[mime]}"
+
+
+class _SourceImages:
+    """按路径缓存解码后的源图像，每张图片只解码并缩小一次"""
+
+    def __init__(self, pending: Dict[str, int], max_size: Optional[int] = None):
+        self._pending = dict(pending)
+        self._max_size = max_size
+        self._images: Dict[str, Image.Image] = {}
+        self._locks: Dict[str, threading.Lock] = {path: threading.Lock() for path in pending}
+
+    def acquire(self, path: str) -> Tuple[Image.Image, float]:
+        """返回解码（并缩小到输出分辨率）后的 RGBA 图像以及本次调用花在解码上的时间"""
+        with self._locks[path]:
+            img = self._images.get(path)
+            if img is not None:
+                return img, 0.0
+            start = time.perf_counter()
+            with Image.open(path) as opened:
+                if self._max_size:
+                    # JPEG 可在解码时按 2 的幂缩小，结果仍不小于目标尺寸
+                    opened.draft("RGB", (self._max_size, self._max_size))
+                img = limit_size(opened, self._max_size).convert("RGBA")
+            self._images[path] = img
+            return img, time.perf_counter() - start
+
+    def release(self, path: str) -> None:
+        """该图片的所有任务完成后释放解码结果"""
+        with self._locks[path]:
+            self._pending[path] -= 1
+            if self._pending[path] == 0:
+                self._images.pop(path, None)
+
+
+def run_batch(specs: Iterable[BatchSpec], output_dir: Path, workers: int = 1,
+              cache: Optional[AnimationCache] = None, max_size: Optional[int] = MAX_OUTPUT_SIZE,
+              video_profile: str = "default", on_result: Optional[Callable[[JobResult], None]] = None) -> List[JobResult]:
+    """
+    执行批量渲染。
+
+    Args:
+        specs: 每张图片的参数组合
+        output_dir: 输出目录
+        workers: 并行任务数
+        cache: 结果缓存，默认不使用
+        max_size: 输出的最大长边（像素），0 或 None 表示不限制
+        video_profile: MP4 / WebM 的编码档位
+        on_result: 每个任务完成时的回调
+
+    Returns:
+        所有任务的结果，顺序与任务生成顺序一致
+    """
+    jobs = [job for spec in specs for job in spec.jobs()]
+    pending: Dict[str, int] = {}
+    for job in jobs:
+        pending[job.image] = pending.get(job.image, 0) + 1
+    sources = _SourceImages(pending, max_size)
+    source_dirs = output_dirs(pending)
+
+    def run(job: BatchJob) -> JobResult:
+        result = JobResult(job)
+        try:
+            img, result.decode_sec = sources.acquire(job.image)
+            start = time.perf_counter()
+            data, mime = make_animation(img, job.effect, job.fmt, job.duration_sec, job.fps, cache=cache,
+                                        max_size=max_size, video_profile=video_profile)
+            result.render_sec = time.perf_counter() - start
+            if data is None:
+                raise ValueError(f"未知的效果: {job.effect}")
+
+            path = output_path(output_dir, source_dirs[job.image], job, mime)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_bytes(data)
+            result.output = path.as_posix()
+            result.bytes = len(data)
+        except Exception as exc:
+            result.error = f"{type(exc).__name__}: {exc}"
+        finally:
+            sources.release(job.image)
+        if on_result is not None:
+            on_result(result)
+        return result
+
+    with ThreadPoolExecutor(max(1, workers)) as executor:
+        return list(executor.map(run, jobs))
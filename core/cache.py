@@ -0,0 +1,180 @@
+"""
+动画结果缓存
+以输入像素和生成参数的哈希为键，缓存编码后的动画数据。
+内存中保留最近使用的结果，磁盘上持久化全部结果，两者都按总字节数做 LRU 淘汰
+"""
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Optional, Tuple, Union
+
+from PIL import Image
+
+# 缓存文件的扩展名，与 MIME 类型一一对应
+SUFFIXES = {
+    "image/gif": ".gif",
+    "video/mp4": ".mp4",
+    "video/webm": ".webm",
+    "image/webp": ".webp",
+    "image/apng": ".png",
+}
+MIME_TYPES = {suffix: mime for mime, suffix in SUFFIXES.items()}
+
+CACHE_DIR = Path("cache")
+MAX_MEMORY_BYTES = 128 * 1024 * 1024
+MAX_DISK_BYTES = 1024 * 1024 * 1024
+
+# 渲染结果的版本号，效果或编码器的输出发生变化时递增，使旧的磁盘缓存失效
+RENDER_VERSION = 6
+
+
+def cache_key(img: Image.Image, **params) -> str:
+    """
+    计算缓存键。
+
+    Args:
+        img: 输入图像，按像素内容（含模式和尺寸）计算哈希
+        **params: 影响输出的生成参数，如效果名、格式、时长和帧率
+
+    Returns:
+        十六进制的哈希字符串
+    """
+    digest = hashlib.blake2b(digest_size=20)
+    digest.update(f"v{RENDER_VERSION}:".encode())
+    digest.update(f"{img.mode}:{img.width}x{img.height}:".encode())
+    digest.update(img.tobytes())
+    for name in sorted(params):
+        digest.update(f"|{name}={params[name]!r}".encode())
+    return digest.hexdigest()
+
+
+class AnimationCache:
+    """
+    内存 + 磁盘两级 LRU 缓存。
+
+    内存层保存最近命中的结果以便毫秒级返回；磁盘层在进程重启后依然有效，
+    命中时会回填内存层。所有操作都是线程安全的。
+    """
+
+    def __init__(self, cache_dir: Optional[Union[str, Path]] = CACHE_DIR,
+                 max_memory_bytes: int = MAX_MEMORY_BYTES, max_disk_bytes: int = MAX_DISK_BYTES):
+        self.cache_dir = Path(cache_dir) if cache_dir is not None else None
+        self.max_memory_bytes = max_memory_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self._memory: "OrderedDict[str, Tuple[bytes, str]]" = OrderedDict()
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[Tuple[bytes, str]]:
+        """查询缓存，命中时返回 (数据, MIME 类型)，否则返回 None"""
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return entry
+
+            path = self._find_on_disk(key)
+            if path is None:
+                self.misses += 1
+                return None
+            try:
+                data = path.read_bytes()
+                # 更新修改时间，磁盘层据此判断最近使用
+                os.utime(path)
+            except OSError:
+                self.misses += 1
+                return None
+
+            entry = (data, MIME_TYPES[path.suffix])
+            self._remember(key, entry)
+            self.disk_hits += 1
+            return entry
+
+    def put(self, key: str, data: bytes, mime: str) -> None:
+        """写入缓存，内存层和磁盘层超出容量时淘汰最久未使用的结果"""
+        with self._lock:
+            self._remember(key, (data, mime))
+            if self.cache_dir is None or mime not in SUFFIXES:
+                return
+
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            path = self.cache_dir / f"{key}{SUFFIXES[mime]}"
+            tmp_path = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+            try:
+                tmp_path.write_bytes(data)
+                os.replace(tmp_path, path)
+            except OSError:
+                tmp_path.unlink(missing_ok=True)
+                return
+            self._evict_disk()
+
+    def clear(self) -> None:
+        """清空内存层和磁盘层"""
+        with self._lock:
+            self._memory.clear()
+            self._memory_bytes = 0
+            if self.cache_dir is not None and self.cache_dir.exists():
+                for path in self._disk_entries():
+                    path.unlink(missing_ok=True)
+
+    def stats(self) -> Dict[str, int]:
+        """返回命中/未命中计数和当前占用"""
+        with self._lock:
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "memory_entries": len(self._memory),
+                "memory_bytes": self._memory_bytes,
+            }
+
+    def _remember(self, key: str, entry: Tuple[bytes, str]) -> None:
+        old = self._memory.pop(key, None)
+        if old is not None:
+            self._memory_bytes -= len(old[0])
+        if len(entry[0]) > self.max_memory_bytes:
+            return
+        self._memory[key] = entry
+        self._memory_bytes += len(entry[0])
+        while self._memory_bytes > self.max_memory_bytes:
+            _, (data, _) = self._memory.popitem(last=False)
+            self._memory_bytes -= len(data)
+            self.evictions += 1
+
+    def _find_on_disk(self, key: str) -> Optional[Path]:
+        if self.cache_dir is None:
+            return None
+        for suffix in MIME_TYPES:
+            path = self.cache_dir / f"{key}{suffix}"
+            if path.is_file():
+                return path
+        return None
+
+    def _disk_entries(self):
+        return [path for path in self.cache_dir.iterdir() if path.suffix in MIME_TYPES and path.is_file()]
+
+    def _evict_disk(self) -> None:
+        entries = []
+        for path in self._disk_entries():
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries, key=lambda entry: entry[0]):
+            if total <= self.max_disk_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+            self.evictions += 1
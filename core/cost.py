@@ -0,0 +1,377 @@
+"""
+渲染成本估算与准入控制
+在渲染开始前，按图像尺寸、帧数、效果和输出格式预测渲染 + 编码耗时和峰值内存，
+再按每台主机的预算决定任务是直接接受、降级（降低分辨率或帧率）后接受，还是拒绝。
+模型系数可以由基准测试结果（benchmarks/bench_animation.py 的 JSON 输出）标定
+"""
+
+import json
+import math
+import os
+import statistics
+from dataclasses import asdict, dataclass, field, replace
+from pathlib import Path
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple, Union
+
+from animations.framestore import peak_reuse
+from animations.registry import REGISTRY
+from animations.tracks import TRACKS, quantize, sample_track
+from .timing import frame_count
+
+# 未标定时的系数：每百万像素、每帧的秒数，取自单核机器上的基准测试（默认编码参数）。
+# 渲染耗时由注册表中的相对成本按整帧拷贝的速度换算；实际使用的默认模型见 BUNDLED_MODEL
+_COPY_SEC_PER_MPX = 0.0012
+_ENCODE_SEC_PER_MPX = {
+    "GIF": 0.025,
+    "WEBP": 0.19,
+    "APNG": 0.29,
+    "MP4": 0.076,
+    "WEBM": 0.17,
+}
+# 各格式编码时同时占用的整帧（RGBA）数：源图及其 RGBA 副本、调色板映射、差异区域、编码器缓冲区等
+_BASE_FRAMES = {
+    "GIF": 12.0,
+    "WEBP": 12.0,
+    "APNG": 12.0,
+    "MP4": 12.0,
+    "WEBM": 12.0,
+}
+# 各效果渲染时的工作集（整帧数，不含待复用帧）：平移类为预合成的源图和一批 BATCH_SIZE 帧的缓冲区，
+# 仿射类为预合成的源图、缩小金字塔和在途帧，只改 alpha 的为共享的 RGB 平面和一批 alpha 平面
+_WORKING_FRAMES: Dict[str, float] = {}
+# 未标定效果的工作集
+_DEFAULT_WORKING_FRAMES = 10.0
+# 与图像尺寸无关的固定内存开销（字节）
+_FIXED_BYTES = 32 * 1024 * 1024
+
+# 降级的下限：分辨率（长边像素）和帧率
+MIN_DOWNGRADE_SIZE = 256
+MIN_DOWNGRADE_FPS = 8
+# 每次降级的比例
+DOWNGRADE_STEP = 0.75
+
+
+@dataclass(frozen=True)
+class CostModel:
+    """
+    成本模型的系数。
+
+    Attributes:
+        render_sec_per_mpx: 各效果渲染一个不重复帧的耗时（秒 / 百万像素）
+        encode_sec_per_mpx: 各格式编码一帧的耗时（秒 / 百万像素）
+        encode_factors: 格式 → 效果 → 编码耗时相对该格式系数的倍数；视频编码器的运动搜索
+            对旋转、缩放类内容慢数倍，GIF / WebP / APNG 合并重复帧后闪烁等效果几乎不耗时；未列出的取 1
+        base_frames: 各格式编码时同时占用的整帧（RGBA）数
+        working_frames: 各效果渲染时的工作集（整帧数，不含待复用帧），未列出的效果取默认值
+        fixed_bytes: 与尺寸无关的固定内存开销
+    """
+    render_sec_per_mpx: Dict[str, float] = field(default_factory=lambda: {
+        name: _COPY_SEC_PER_MPX * info.cost for name, info in REGISTRY.items()})
+    encode_sec_per_mpx: Dict[str, float] = field(default_factory=lambda: dict(_ENCODE_SEC_PER_MPX))
+    encode_factors: Dict[str, Dict[str, float]] = field(default_factory=dict)
+    base_frames: Dict[str, float] = field(default_factory=lambda: dict(_BASE_FRAMES))
+    working_frames: Dict[str, float] = field(default_factory=lambda: dict(_WORKING_FRAMES))
+    fixed_bytes: int = _FIXED_BYTES
+
+    def working_set(self, effect: str) -> float:
+        return self.working_frames.get(effect, _DEFAULT_WORKING_FRAMES)
+
+    def encode_rate(self, fmt: str, effect: str) -> float:
+        """该效果以该格式编码一帧的耗时（秒 / 百万像素）"""
+        return self.encode_sec_per_mpx[fmt] * self.encode_factors.get(fmt, {}).get(effect, 1.0)
+
+    def to_dict(self) -> Dict:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "CostModel":
+        """从 JSON 数据创建模型，缺少的系数取默认值"""
+        default = cls()
+        return cls(render_sec_per_mpx={**default.render_sec_per_mpx, **data.get("render_sec_per_mpx", {})},
+                   encode_sec_per_mpx={**default.encode_sec_per_mpx, **data.get("encode_sec_per_mpx", {})},
+                   encode_factors={fmt: dict(factors) for fmt, factors in data.get("encode_factors", {}).items()},
+                   base_frames={**default.base_frames, **data.get("base_frames", {})},
+                   working_frames={**default.working_frames, **data.get("working_frames", {})},
+                   fixed_bytes=int(data.get("fixed_bytes", default.fixed_bytes)))
+
+    @classmethod
+    def load(cls, path: Union[str, Path]) -> "CostModel":
+        return cls.from_dict(json.loads(Path(path).read_text(encoding="utf-8")))
+
+
+class CostEstimate(NamedTuple):
+    """一次渲染的预测成本"""
+    frames: int
+    render_sec: float
+    encode_sec: float
+    peak_bytes: int
+
+    @property
+    def seconds(self) -> float:
+        return self.render_sec + self.encode_sec
+
+
+def output_size(size: Tuple[int, int], max_size: Optional[int]) -> Tuple[int, int]:
+    """与 pipeline.limit_size 相同的规则计算输出尺寸，不处理像素"""
+    if not max_size or max(size) <= max_size:
+        return size
+    scale = max_size / max(size)
+    return max(1, round(size[0] * scale)), max(1, round(size[1] * scale))
+
+
+def _segment_units(effect: str, num_frames: int, size: Tuple[int, int]) -> Tuple[int, int, int]:
+    """
+    效果的 (产出帧数, 需要渲染的不重复帧数, 需要保留以待复用的帧数)。
+
+    按效果函数的方式对轨迹采样，量化后的帧状态即 reuse_frames 的复用键：
+    状态相同的帧只渲染一次，并从首次出现保留到最后一次出现。
+    只改 alpha 的帧共享源图的 RGB 平面，不额外占用整帧
+    """
+    info = REGISTRY[effect]
+    keys = [quantize(state) for state in sample_track(TRACKS[info.function], size, num_frames,
+                                                      info.periodic, **info.params)]
+    held = 0 if info.alpha_only else peak_reuse(keys)
+    return num_frames, len(set(keys)), held
+
+
+def estimate(size: Tuple[int, int], num_frames: int, effect: Union[str, Sequence[Tuple[str, float]]], fmt: str,
+             model: Optional[CostModel] = None) -> CostEstimate:
+    """
+    预测一次渲染的耗时和峰值内存。
+
+    Args:
+        size: 输出尺寸 (宽, 高)
+        num_frames: 请求的帧数（duration_sec * fps）
+        effect: 效果名称；多效果时间轴传入 [(效果名称, 时长秒数), ...]，按时长分配帧数
+        fmt: 输出格式（已规范化的 FORMATS 键）
+        model: 成本模型，默认使用 DEFAULT_MODEL
+
+    Returns:
+        预测成本
+    """
+    model = model or DEFAULT_MODEL
+    mpx = size[0] * size[1] / 1e6
+    frame_bytes = size[0] * size[1] * 4
+
+    if isinstance(effect, str):
+        frames, unique, held = _segment_units(effect, num_frames, size)
+        render_sec = unique * mpx * model.render_sec_per_mpx[effect]
+        encode_sec = frames * mpx * model.encode_rate(fmt, effect)
+        working = model.working_set(effect)
+    else:
+        # 时间轴每帧都是一次变换，只有状态完全相同的帧才复用，按不去重估算；
+        # 各段依次渲染，工作集取其中最大的一段
+        total = sum(duration for _, duration in effect) or 1.0
+        frames, held, render_sec, encode_sec = num_frames, 0, 0.0, 0.0
+        for name, duration in effect:
+            segment_frames = num_frames * duration / total
+            render_sec += segment_frames * mpx * model.render_sec_per_mpx[name]
+            encode_sec += segment_frames * mpx * model.encode_rate(fmt, name)
+        working = max(model.working_set(name) for name, _ in effect)
+
+    peak_bytes = model.fixed_bytes + int((model.base_frames[fmt] + working + held) * frame_bytes)
+    return CostEstimate(frames, render_sec, encode_sec, peak_bytes)
+
+
+# -------------- 标定 -------------- #
+
+def _round_up(frames: float) -> float:
+    """帧数向上保留两位小数，取整后的估算仍不低于实测峰值"""
+    return math.ceil(frames * 100) / 100
+
+
+def calibrate(results: Iterable[Dict], base: Optional[CostModel] = None) -> CostModel:
+    """
+    由基准测试结果标定模型系数。
+
+    渲染耗时取各效果每百万像素耗时的中位数；编码耗时取各格式的中位数，
+    再按 格式 × 效果 的中位数给出相对倍数。
+    内存按 格式基数 + 效果工作集 拆分：每个格式的基数取该格式下占用最少的效果，
+    每个效果的工作集取其所有用例超出格式基数的最大值，预测值不低于任何一次观测。
+    结果中没有覆盖到的效果和格式保留 base 中的系数。
+
+    Args:
+        results: bench_animation 输出的 results 列表
+        base: 作为起点的模型，默认使用未标定的系数
+    """
+    base = base or CostModel()
+    render: Dict[str, List[float]] = {}
+    encode: Dict[Tuple[str, str], List[float]] = {}
+    memory: Dict[Tuple[str, str], float] = {}
+    for row in results:
+        effect, fmt = row["effect"], row["format"].upper()
+        if effect not in REGISTRY:
+            continue
+        mpx = row["width"] * row["height"] / 1e6
+        frames, unique, held = _segment_units(effect, row["requested_frames"], (row["width"], row["height"]))
+        if mpx <= 0 or frames <= 0:
+            continue
+        render.setdefault(effect, []).append(row["render_sec"] / (unique * mpx))
+        encode.setdefault((fmt, effect), []).append(row["encode_sec"] / (frames * mpx))
+        delta = row.get("peak_rss_delta_bytes")
+        if delta is not None:
+            frame_bytes = row["width"] * row["height"] * 4
+            frames_used = max(0.0, max(0, delta - base.fixed_bytes) / frame_bytes - held)
+            memory[effect, fmt] = max(memory.get((effect, fmt), 0.0), frames_used)
+
+    by_format: Dict[str, List[float]] = {}
+    for (fmt, effect), values in encode.items():
+        by_format.setdefault(fmt, []).extend(values)
+    encode_sec_per_mpx = {fmt: statistics.median(values) for fmt, values in by_format.items()}
+    encode_factors = {fmt: dict(base.encode_factors.get(fmt, {})) for fmt in base.encode_factors}
+    for (fmt, effect), values in encode.items():
+        if encode_sec_per_mpx[fmt] > 0:
+            factors = encode_factors.setdefault(fmt, {})
+            factors[effect] = round(statistics.median(values) / encode_sec_per_mpx[fmt], 4)
+
+    base_frames: Dict[str, float] = {}
+    for (effect, fmt), frames_used in memory.items():
+        base_frames[fmt] = min(base_frames.get(fmt, frames_used), frames_used)
+    working_frames: Dict[str, float] = {}
+    for (effect, fmt), frames_used in memory.items():
+        working_frames[effect] = max(working_frames.get(effect, 0.0), frames_used - base_frames[fmt])
+
+    return replace(
+        base,
+        render_sec_per_mpx={**base.render_sec_per_mpx,
+                            **{name: statistics.median(values) for name, values in render.items()}},
+        encode_sec_per_mpx={**base.encode_sec_per_mpx, **encode_sec_per_mpx},
+        encode_factors=encode_factors,
+        base_frames={**base.base_frames, **{name: _round_up(value) for name, value in base_frames.items()}},
+        working_frames={**base.working_frames, **{name: _round_up(value) for name, value in working_frames.items()}},
+    )
+
+
+# -------------- 准入控制 -------------- #
+
+# 准入决定
+ADMIT = "admit"
+DOWNGRADE = "downgrade"
+REJECT = "reject"
+
+
+class Budget(NamedTuple):
+    """
+    每台主机的渲染预算。
+
+    Attributes:
+        max_job_sec: 单个任务预测耗时的上限（秒）
+        max_job_bytes: 单个任务预测峰值内存的上限（字节）
+        memory_bytes: 同时运行的任务预测峰值内存之和的上限，超出时后续任务排队等待；0 表示不限制
+    """
+    max_job_sec: float = 120.0
+    max_job_bytes: int = 2 * 1024 ** 3
+    memory_bytes: int = 0
+
+    @classmethod
+    def from_env(cls) -> "Budget":
+        """
+        从环境变量读取预算：RENDER_MAX_JOB_SEC、RENDER_MAX_JOB_MB、RENDER_MEMORY_BUDGET_MB，
+        未设置内存总预算时取物理内存的一半
+        """
+        default = cls()
+        memory_mb = os.environ.get("RENDER_MEMORY_BUDGET_MB")
+        return cls(
+            max_job_sec=float(os.environ.get("RENDER_MAX_JOB_SEC", default.max_job_sec)),
+            max_job_bytes=int(os.environ.get("RENDER_MAX_JOB_MB", default.max_job_bytes // 1024 ** 2)) * 1024 ** 2,
+            memory_bytes=int(memory_mb) * 1024 ** 2 if memory_mb is not None else _physical_memory() // 2,
+        )
+
+    def fits(self, cost: CostEstimate) -> bool:
+        return cost.seconds <= self.max_job_sec and cost.peak_bytes <= self.max_job_bytes
+
+
+class Admission(NamedTuple):
+    """
+    准入决定。
+
+    Attributes:
+        action: ADMIT、DOWNGRADE 或 REJECT
+        max_size: 应使用的最大输出分辨率（长边像素），降级时小于请求值
+        fps: 应使用的帧率，降级时小于请求值
+        cost: 按最终参数预测的成本
+        reason: 降级或拒绝的原因
+    """
+    action: str
+    max_size: Optional[int]
+    fps: int
+    cost: CostEstimate
+    reason: str = ""
+
+
+def admit(size: Tuple[int, int], effect: Union[str, Sequence[Tuple[str, float]]], fmt: str, duration_sec: float,
+          fps: int, max_size: Optional[int], budget: Budget, model: Optional[CostModel] = None,
+          allow_downgrade: bool = True) -> Admission:
+    """
+    按预算决定是否接受一次渲染。
+
+    超出单任务预算时先逐步降低分辨率（不低于 MIN_DOWNGRADE_SIZE），仍超出再降低帧率
+    （不低于 MIN_DOWNGRADE_FPS）；降到下限仍超出，或不允许降级时拒绝。
+
+    Args:
+        size: 源图尺寸
+        effect: 效果名称，或时间轴的 [(效果名称, 时长秒数), ...]
+        fmt: 输出格式（已规范化的 FORMATS 键）
+        duration_sec: 动画时长（秒）
+        fps: 请求的帧率
+        max_size: 请求的最大输出分辨率，0 或 None 表示不限制
+        budget: 主机预算
+        model: 成本模型，默认使用 DEFAULT_MODEL
+        allow_downgrade: 是否允许降级
+    """
+    def cost_for(limit: Optional[int], rate: int) -> CostEstimate:
+        return estimate(output_size(size, limit), frame_count(duration_sec, rate), effect, fmt, model)
+
+    fps = int(fps)
+    cost = cost_for(max_size, fps)
+    if budget.fits(cost):
+        return Admission(ADMIT, max_size, fps, cost)
+    over = _over_budget(cost, budget)
+    if not allow_downgrade:
+        return Admission(REJECT, max_size, fps, cost, over)
+
+    limit = max(output_size(size, max_size))
+    while not budget.fits(cost) and limit > MIN_DOWNGRADE_SIZE:
+        limit = max(MIN_DOWNGRADE_SIZE, int(limit * DOWNGRADE_STEP))
+        cost = cost_for(limit, fps)
+    while not budget.fits(cost) and fps > MIN_DOWNGRADE_FPS:
+        fps = max(MIN_DOWNGRADE_FPS, int(fps * DOWNGRADE_STEP))
+        cost = cost_for(limit, fps)
+    if not budget.fits(cost):
+        return Admission(REJECT, limit, fps, cost, over)
+    return Admission(DOWNGRADE, limit, fps, cost, over)
+
+
+def _over_budget(cost: CostEstimate, budget: Budget) -> str:
+    reasons = []
+    if cost.seconds > budget.max_job_sec:
+        reasons.append(f"预计耗时 {cost.seconds:.0f} 秒，超过上限 {budget.max_job_sec:g} 秒")
+    if cost.peak_bytes > budget.max_job_bytes:
+        reasons.append(f"预计内存 {cost.peak_bytes / 1024 ** 2:.0f} MB，"
+                       f"超过上限 {budget.max_job_bytes / 1024 ** 2:.0f} MB")
+    return "；".join(reasons)
+
+
+def _physical_memory() -> int:
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+    except (AttributeError, ValueError, OSError):
+        return 0
+
+
+# 随代码发布的标定结果（benchmarks/bench_animation.py --calibrate 的输出）
+BUNDLED_MODEL = Path(__file__).with_name("cost_model.json")
+
+
+def _load_default() -> CostModel:
+    """
+    读取默认模型：设置 RENDER_COST_MODEL 时从该 JSON 文件（calibrate 的输出）读取，
+    否则使用随代码发布的标定结果，都没有时使用未标定的系数
+    """
+    path = os.environ.get("RENDER_COST_MODEL")
+    if not path and BUNDLED_MODEL.exists():
+        path = BUNDLED_MODEL
+    return CostModel.load(path) if path else CostModel()
+
+
+DEFAULT_MODEL = _load_default()
@@ -0,0 +1,390 @@
+"""
+动画编码器
+将效果函数产生的帧流逐帧编码为 GIF / MP4 / WebM / WebP / APNG 数据，全程不落盘
+"""
+
+import subprocess
+import threading
+import weakref
+from fractions import Fraction
+from itertools import chain
+from dataclasses import dataclass
+from io import BytesIO
+from typing import IO, Any, Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+import numpy as np
+import imageio_ffmpeg
+from PIL import Image
+
+from animations.frames import AlphaFrame, Frame, frame_size, to_array, to_image
+from .apng import ApngWriter
+from .gif import MIN_DELAY_CS, GifWriter, build_palette, palette_indices
+from .timing import timed_frames
+
+
+def _buffer(array: np.ndarray) -> memoryview:
+    """以字节视图的形式返回数组内存，连续数组不产生拷贝"""
+    return memoryview(np.ascontiguousarray(array, dtype=np.uint8)).cast("B")
+
+
+def _frame_bytes(frame: Frame) -> Union[bytes, memoryview]:
+    """返回帧的原始 RGBA 字节，NumPy 帧直接复用其内存"""
+    if isinstance(frame, Image.Image):
+        if frame.mode != "RGBA":
+            frame = frame.convert("RGBA")
+        return frame.tobytes()
+    return _buffer(to_array(frame))
+
+
+def _frame_planes(frame: Frame, alpha: bool) -> List[memoryview]:
+    """
+    按 ffmpeg 的 gbrp / gbrap 平面顺序返回帧数据。
+
+    AlphaFrame 的 RGB 平面由所有帧共享，这里直接引用，
+    每帧真正写出的新数据只有 alpha 平面。
+    """
+    if isinstance(frame, AlphaFrame):
+        r, g, b = frame.rgb
+        planes = [g, b, r] + ([frame.alpha] if alpha else [])
+    else:
+        array = to_array(frame)
+        planes = [array[..., 1], array[..., 2], array[..., 0]] + ([array[..., 3]] if alpha else [])
+    return [_buffer(plane) for plane in planes]
+
+
+class FrameMemo:
+    """
+    按帧对象身份缓存转换结果。
+
+    效果层对重复帧产出同一个对象的引用，编码器借此跳过重复的格式转换；
+    帧对象被释放后（效果层不会再产出它），对应的缓存项自动失效。
+    """
+
+    def __init__(self, convert: Callable[[Frame], Any]):
+        self.convert = convert
+        self._items: Dict[int, Tuple[weakref.ref, Any]] = {}
+
+    def __call__(self, frame: Frame) -> Any:
+        key = id(frame)
+        item = self._items.get(key)
+        if item is not None and item[0]() is frame:
+            return item[1]
+        value = self.convert(frame)
+        self._items[key] = (weakref.ref(frame, lambda _, key=key: self._items.pop(key, None)), value)
+        return value
+
+
+def _drain(stream: IO[bytes], sink: BytesIO) -> None:
+    """在后台线程中持续读取管道，避免 ffmpeg 因输出缓冲区写满而阻塞"""
+    for chunk in iter(lambda: stream.read(1 << 16), b""):
+        sink.write(chunk)
+
+
+class FFmpegPipeEncoder:
+    """
+    通过管道驱动 ffmpeg 的流式编码器。
+
+    帧从 stdin 逐帧写入，编码结果从 stdout 收集到内存缓冲区，
+    因此不需要临时文件；进程在首帧到达时根据帧尺寸启动。
+    首帧为 AlphaFrame 时以平面格式输入，共享的 RGB 平面无需展开；
+    alpha 为 False 时输出格式不含透明通道，alpha 平面也不会写出。
+    """
+
+    def __init__(self, fps: float, codec: str = "libx264", pixelformat: str = "yuv420p",
+                 container: str = "mp4", output_params: Optional[List[str]] = None, alpha: bool = False):
+        self.fps = fps
+        self.codec = codec
+        self.pixelformat = pixelformat
+        self.container = container
+        self.output_params = output_params or []
+        self.alpha = alpha
+        self._planar = False
+        self._buffers = FrameMemo(self._frame_buffers)
+        self._proc: Optional[subprocess.Popen] = None
+        self._readers: List[threading.Thread] = []
+        self._stdout = BytesIO()
+        self._stderr = BytesIO()
+
+    def _start(self, frame: Frame) -> None:
+        self._planar = isinstance(frame, AlphaFrame)
+        if self._planar:
+            pix_fmt_in = "gbrap" if self.alpha else "gbrp"
+        else:
+            pix_fmt_in = "rgba"
+
+        width, height = frame_size(frame)
+        cmd = [
+            imageio_ffmpeg.get_ffmpeg_exe(), "-y",
+            "-f", "rawvideo", "-vcodec", "rawvideo",
+            "-s", f"{width:d}x{height:d}", "-pix_fmt", pix_fmt_in,
+            "-r", str(Fraction(self.fps).limit_denominator(1 << 16)),
+            "-i", "-", "-an",
+            "-vcodec", self.codec, "-pix_fmt", self.pixelformat,
+        ]
+        if "420" in self.pixelformat and (width % 2 or height % 2):
+            # 4:2:0 色度抽样要求宽高为偶数，奇数边在右侧/底部补一像素
+            cmd += ["-vf", "pad=ceil(iw/2)*2:ceil(ih/2)*2"]
+        cmd += self.output_params
+        cmd += ["-v", "error", "-f", self.container, "pipe:1"]
+
+        self._proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        for stream, sink in ((self._proc.stdout, self._stdout), (self._proc.stderr, self._stderr)):
+            reader = threading.Thread(target=_drain, args=(stream, sink), daemon=True)
+            reader.start()
+            self._readers.append(reader)
+
+    def _frame_buffers(self, frame: Frame) -> List[Union[bytes, memoryview]]:
+        if self._planar:
+            return _frame_planes(frame, self.alpha)
+        return [_frame_bytes(frame)]
+
+    def write(self, frame: Frame) -> None:
+        """写入一帧，重复的帧对象复用已转换的数据"""
+        if self._proc is None:
+            self._start(frame)
+        try:
+            for buffer in self._buffers(frame):
+                self._proc.stdin.write(buffer)
+        except BrokenPipeError:
+            # ffmpeg 已经退出，错误信息在 finish() 中统一抛出
+            self.finish()
+            raise
+
+    def finish(self) -> bytes:
+        """结束编码并返回完整的编码数据"""
+        if self._proc is None:
+            raise ValueError("没有可编码的帧")
+        if not self._proc.stdin.closed:
+            self._proc.stdin.close()
+        self._proc.wait()
+        for reader in self._readers:
+            reader.join()
+        if self._proc.returncode != 0:
+            message = self._stderr.getvalue().decode("utf-8", "replace").strip()
+            raise RuntimeError(f"ffmpeg 编码失败 (返回码 {self._proc.returncode}): {message}")
+        return self._stdout.getvalue()
+
+    def abort(self) -> None:
+        """终止编码进程并释放资源"""
+        if self._proc is not None and self._proc.poll() is None:
+            self._proc.kill()
+            self._proc.wait()
+
+    def __enter__(self) -> "FFmpegPipeEncoder":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is not None:
+            self.abort()
+
+
+def encode_gif(frames: Iterable[Frame], frame_delay: float, palette_source: Optional[Image.Image] = None,
+               loop: Optional[int] = None) -> bytes:
+    """
+    将帧流编码为 GIF。
+
+    所有帧共用由首帧（及 palette_source）构建的全局调色板，每帧只写出变化的区域；
+    重复的帧对象只映射一次调色板，连续的相同帧合并为一帧并累加延迟。
+    浏览器会把小于 2/100 秒的延迟当作 1/10 秒播放，帧间隔不足 MIN_DELAY_CS 的帧
+    并入前一帧（见 core.timing.timed_frames），高帧率下动画的总时长保持不变。
+
+    Args:
+        frames: 帧流
+        frame_delay: 每帧延迟（秒）
+        palette_source: 额外参与构建调色板的图像，通常是效果的源图
+        loop: 循环次数，0 为无限循环，None 不写循环扩展（只播放一次）
+    """
+    frames = iter(frames)
+    try:
+        first = next(frames)
+    except StopIteration:
+        raise ValueError("没有可编码的帧") from None
+
+    samples = [to_array(first)]
+    if palette_source is not None:
+        samples.append(to_array(palette_source))
+    palette = build_palette(samples)
+    del samples
+
+    indices = FrameMemo(lambda frame: palette_indices(to_array(frame), palette))
+    writer = GifWriter(frame_size(first), palette, loop=loop)
+    for timed in timed_frames(chain([first], frames), frame_delay, unit=100, min_delay=MIN_DELAY_CS):
+        writer.add(indices(timed.frame), timed.delay)
+    return writer.finish()
+
+
+def encode_webp(frames: Iterable[Frame], frame_delay: float, lossless: bool = False, quality: int = 80,
+                method: Optional[int] = None, loop: int = 1) -> bytes:
+    """
+    将帧流编码为动画 WebP，保留 alpha 通道。
+
+    直接驱动 libwebp 的动画编码器逐帧送入（与 Pillow 的 WebPImagePlugin 保存多帧时的用法相同），
+    不像 Image.save(save_all=True) 那样先把所有帧收集到列表中。
+    libwebp 自行计算帧间差异区域；连续重复的帧对象只送入一次，由该帧延长显示。
+    该编码器是 Pillow 的私有接口，当前调用方式自 Pillow 11 起才可用；
+    更早的版本退回 _encode_webp_saved，经公开的 Image.save 编码。
+
+    Args:
+        frames: 帧流
+        frame_delay: 每帧延迟（秒）
+        lossless: 是否无损编码
+        quality: 有损编码的质量 (0-100)；无损时表示压缩力度
+        method: 编码速度与压缩率的权衡 (0-6)，越大越慢、文件越小；
+            默认有损取 4，无损取 0（无损时 method 对耗时影响极大，而文件只小约两成）
+        loop: 播放次数，0 为无限循环
+    """
+    try:
+        from PIL import _webp
+    except ImportError:
+        raise RuntimeError("当前 Pillow 未编译 WebP 支持") from None
+
+    if method is None:
+        method = 0 if lossless else 4
+    if not hasattr(Image.Image, "getim"):
+        return _encode_webp_saved(frames, frame_delay, lossless, quality, method, loop)
+
+    encoder = None
+    end = 0
+    for timed in timed_frames(frames, frame_delay):
+        image = to_image(timed.frame)
+        if image.mode != "RGBA":
+            image = image.convert("RGBA")
+        if encoder is None:
+            # 背景色为全透明；关键帧间隔取 Pillow（源自 gif2webp）的默认值
+            kmin, kmax = (9, 17) if lossless else (3, 5)
+            encoder = _webp.WebPAnimEncoder(image.size, 0, loop, False, kmin, kmax, False, False)
+        encoder.add(image.getim(), timed.start, lossless, quality, 100, method)
+        end = timed.end
+    if encoder is None:
+        raise ValueError("没有可编码的帧")
+
+    # 以结束时间再调用一次，写出最后一帧的时长
+    encoder.add(None, end, lossless, quality, 100, 0)
+    data = encoder.assemble("", b"", b"")
+    if data is None:
+        raise RuntimeError("WebP 编码失败")
+    return data
+
+
+def _encode_webp_saved(frames: Iterable[Frame], frame_delay: float, lossless: bool, quality: int,
+                       method: int, loop: int) -> bytes:
+    """经 Image.save(save_all=True) 编码动画 WebP；各段的帧需要先收集到列表中"""
+    images: List[Image.Image] = []
+    durations: List[int] = []
+    for timed in timed_frames(frames, frame_delay):
+        image = to_image(timed.frame)
+        images.append(image if image.mode == "RGBA" else image.convert("RGBA"))
+        durations.append(timed.delay)
+    if not images:
+        raise ValueError("没有可编码的帧")
+
+    buffer = BytesIO()
+    images[0].save(buffer, format="WEBP", save_all=True, append_images=images[1:], duration=durations,
+                   loop=loop, lossless=lossless, quality=quality, method=method, background=(0, 0, 0, 0))
+    return buffer.getvalue()
+
+
+def encode_apng(frames: Iterable[Frame], frame_delay: float, compress_level: int = 6, loop: int = 1) -> bytes:
+    """
+    将帧流编码为 APNG（无损，保留 alpha 通道）。
+
+    每帧只写出变化的区域，连续的相同帧合并为一帧并累加延迟。
+
+    Args:
+        frames: 帧流
+        frame_delay: 每帧延迟（秒）
+        compress_level: zlib 压缩级别 (0-9)，越大越慢、文件越小
+        loop: 播放次数，0 为无限循环
+    """
+    writer = ApngWriter(loop=loop, compress_level=compress_level)
+    for timed in timed_frames(frames, frame_delay):
+        writer.add(to_array(timed.frame), timed.delay)
+    return writer.finish()
+
+
+@dataclass(frozen=True)
+class VideoProfile:
+    """视频编码档位：分别给出 H.264 与 VP9 在编码速度和文件体积之间的取舍参数"""
+    x264: Tuple[str, ...]
+    vp9: Tuple[str, ...]
+
+
+VIDEO_PROFILES = {
+    # 预览：编码最快，画质够看即可
+    "preview": VideoProfile(
+        x264=("-preset", "ultrafast", "-crf", "28"),
+        vp9=("-deadline", "realtime", "-cpu-used", "8", "-crf", "40"),
+    ),
+    # 默认：与原先的输出一致，接近无损
+    "default": VideoProfile(
+        x264=("-crf", "10"),
+        vp9=("-deadline", "good", "-cpu-used", "4", "-crf", "30"),
+    ),
+    # 最终输出：编码更慢，相同观感下文件更小
+    "final": VideoProfile(
+        x264=("-preset", "slow", "-crf", "18"),
+        vp9=("-deadline", "good", "-cpu-used", "1", "-crf", "28"),
+    ),
+}
+
+
+def _profile(name: str) -> VideoProfile:
+    profile = VIDEO_PROFILES.get(name)
+    if profile is None:
+        raise ValueError(f"未知的视频编码档位: {name}（可选 {', '.join(VIDEO_PROFILES)}）")
+    return profile
+
+
+def _threads_params(threads: Optional[int]) -> List[str]:
+    """编码线程数，None 或 0 时由 ffmpeg 自动决定"""
+    return ["-threads", str(int(threads))] if threads else []
+
+
+def encode_mp4(frames: Iterable[Frame], fps: float, profile: str = "default", threads: Optional[int] = None) -> bytes:
+    """
+    将帧流编码为 H.264 MP4。
+
+    输出为分片 MP4 (fragmented MP4)，这样 moov 信息写在文件开头，
+    ffmpeg 无需回写即可直接输出到管道。yuv420p 不含透明通道。
+
+    Args:
+        frames: 帧流
+        fps: 帧率，可以是 Fraction 表示的有理数帧率
+        profile: VIDEO_PROFILES 中的编码档位
+        threads: 编码线程数
+    """
+    with FFmpegPipeEncoder(
+        fps,
+        codec="libx264",
+        pixelformat="yuv420p",
+        output_params=list(_profile(profile).x264) + _threads_params(threads)
+        + ["-movflags", "frag_keyframe+empty_moov+default_base_moof"],
+    ) as encoder:
+        for frame in frames:
+            encoder.write(frame)
+        return encoder.finish()
+
+
+def encode_webm(frames: Iterable[Frame], fps: float, profile: str = "default", threads: Optional[int] = None) -> bytes:
+    """
+    将帧流编码为带透明通道的 VP9 WebM (yuva420p)。
+
+    以恒定质量模式（-b:v 0 + CRF）编码；输出到管道时 WebM 不写索引，浏览器可正常顺序播放。
+
+    Args:
+        frames: 帧流
+        fps: 帧率，可以是 Fraction 表示的有理数帧率
+        profile: VIDEO_PROFILES 中的编码档位
+        threads: 编码线程数，同时开启 VP9 的按行多线程
+    """
+    with FFmpegPipeEncoder(
+        fps,
+        codec="libvpx-vp9",
+        pixelformat="yuva420p",
+        container="webm",
+        output_params=["-b:v", "0", "-row-mt", "1"] + list(_profile(profile).vp9) + _threads_params(threads),
+        alpha=True,
+    ) as encoder:
+        for frame in frames:
+            encoder.write(frame)
+        return encoder.finish()
@@ -0,0 +1,157 @@
+"""
+GIF 编码
+所有帧共用一个全局调色板，每帧只写出与屏幕上当前内容不同的矩形区域，
+区域内未变化的像素写成透明色以提高 LZW 压缩率；连续的相同帧合并为一帧并累加延迟。
+"""
+
+from io import BytesIO
+from typing import Iterable, Optional, Tuple
+
+import numpy as np
+from PIL import GifImagePlugin, Image
+from PIL._binary import o8, o16le as o16
+
+# 全局调色板中的颜色数，最后一个索引保留给透明色
+PALETTE_COLORS = 255
+TRANSPARENT_INDEX = 255
+# alpha 低于该值的像素视为透明（GIF 只有全透明和不透明两种状态）
+ALPHA_THRESHOLD = 128
+# 构建调色板时每个样本图像最多取的像素数
+SAMPLE_PIXELS = 128 * 128
+# 帧的最短延迟（百分之一秒）：浏览器把更短的延迟当作 1/10 秒播放
+MIN_DELAY_CS = 2
+
+# GIF 帧的处置方式
+DISPOSE_NONE = 1
+DISPOSE_BACKGROUND = 2
+
+
+def build_palette(samples: Iterable[np.ndarray]) -> Image.Image:
+    """
+    由若干 RGBA 样本的不透明像素构建全局调色板。
+
+    Args:
+        samples: (H, W, 4) 的 uint8 数组
+
+    Returns:
+        带 PALETTE_COLORS 种颜色的 "P" 模式调色板图像，可直接用于 Image.quantize(palette=...)
+    """
+    pixels = []
+    for sample in samples:
+        sample = sample.reshape(-1, 4)
+        step = max(1, len(sample) // SAMPLE_PIXELS)
+        sample = sample[::step]
+        pixels.append(sample[sample[:, 3] >= ALPHA_THRESHOLD, :3])
+    # 白色是透明区域边缘混合的目标色，总是放入样本
+    pixels.append(np.full((1, 3), 255, np.uint8))
+    pixels = np.concatenate(pixels)
+    palette = Image.fromarray(pixels.reshape(1, -1, 3), "RGB").quantize(PALETTE_COLORS, method=Image.Quantize.FASTOCTREE)
+
+    # 补齐为 256 色，透明色占用最后一个索引
+    colors = palette.getpalette()[:PALETTE_COLORS * 3]
+    palette.putpalette(colors + [0] * (768 - len(colors)))
+    return palette
+
+
+def palette_indices(frame: np.ndarray, palette: Image.Image) -> np.ndarray:
+    """将 RGBA 帧映射为全局调色板的索引（不抖动，保证帧间相同像素的索引一致）"""
+    rgb = Image.fromarray(frame, "RGBA").convert("RGB")
+    indices = np.array(rgb.quantize(palette=palette, dither=Image.Dither.NONE))
+    indices[frame[..., 3] < ALPHA_THRESHOLD] = TRANSPARENT_INDEX
+    return indices
+
+
+def _bbox(mask: np.ndarray) -> Optional[Tuple[int, int, int, int]]:
+    """mask 中为真的元素的包围盒 (left, top, right, bottom)，全假时返回 None"""
+    rows = np.flatnonzero(mask.any(axis=1))
+    if not len(rows):
+        return None
+    cols = np.flatnonzero(mask.any(axis=0))
+    return int(cols[0]), int(rows[0]), int(cols[-1]) + 1, int(rows[-1]) + 1
+
+
+class GifWriter:
+    """
+    增量 GIF 写入器。
+
+    每帧以全画布的调色板索引给出。写入器记录屏幕当前内容，只写出变化的矩形；
+    当下一帧需要把已显示的像素变回透明时，上一帧改用“恢复背景”处置
+    （并在必要时扩大矩形以覆盖这些像素），因此需要缓存一帧再写出。
+    """
+
+    def __init__(self, size: Tuple[int, int], palette: Image.Image, loop: Optional[int] = None):
+        self.size = size
+        self._buffer = BytesIO()
+        self._screen = np.full((size[1], size[0]), TRANSPARENT_INDEX, np.uint8)
+        self._pending: Optional[np.ndarray] = None
+        self._pending_delay = 0
+        self._frames = 0
+        self._write_header(palette, loop)
+
+    def _write_header(self, palette: Image.Image, loop: Optional[int]) -> None:
+        w, h = self.size
+        # 全局颜色表标志 | 颜色分辨率 8 位 | 颜色表大小 256
+        self._buffer.write(b"GIF89a" + o16(w) + o16(h) + o8(0x80 | 0x70 | 7) + o8(TRANSPARENT_INDEX) + o8(0))
+        self._buffer.write(bytes(palette.getpalette()[:768]))
+        if loop is not None:
+            self._buffer.write(b"!" + o8(255) + o8(11) + b"NETSCAPE2.0" + o8(3) + o8(1) + o16(loop) + o8(0))
+
+    def add(self, indices: np.ndarray, delay_cs: int) -> None:
+        """
+        添加一帧。
+
+        Args:
+            indices: (H, W) 的调色板索引，透明像素为 TRANSPARENT_INDEX
+            delay_cs: 显示时长（百分之一秒）
+        """
+        pending = self._pending
+        if pending is not None and (indices is pending or np.array_equal(indices, pending)):
+            self._pending_delay += delay_cs
+            return
+        if pending is not None:
+            self._flush(indices)
+        self._pending = indices
+        self._pending_delay = delay_cs
+
+    def finish(self) -> bytes:
+        """写出最后一帧和文件尾，返回完整的 GIF 数据"""
+        if self._pending is None:
+            raise ValueError("没有可编码的帧")
+        self._flush(None)
+        self._buffer.write(b";")
+        return self._buffer.getvalue()
+
+    def _flush(self, next_indices: Optional[np.ndarray]) -> None:
+        frame, screen = self._pending, self._screen
+        unchanged = frame == screen
+        region = ~unchanged
+
+        # 下一帧要变回透明的像素：只能通过本帧的“恢复背景”处置清除
+        disposal = DISPOSE_NONE
+        if next_indices is not None:
+            clear = (next_indices == TRANSPARENT_INDEX) & (frame != TRANSPARENT_INDEX)
+            if clear.any():
+                disposal = DISPOSE_BACKGROUND
+                region |= clear
+
+        if self._frames == 0:
+            # 首帧写出整个画布，兼容对局部首帧处理不佳的解码器
+            box = (0, 0) + self.size
+        else:
+            box = _bbox(region) or (0, 0, 1, 1)
+        left, top, right, bottom = box
+
+        patch = frame[top:bottom, left:right].copy()
+        patch[unchanged[top:bottom, left:right]] = TRANSPARENT_INDEX
+        for chunk in GifImagePlugin.getdata(Image.fromarray(patch, "L"), offset=(left, top),
+                                            duration=self._pending_delay * 10,
+                                            transparency=TRANSPARENT_INDEX, disposal=disposal):
+            self._buffer.write(chunk)
+        self._frames += 1
+
+        # 更新屏幕内容：先显示本帧，再按处置方式清除矩形
+        screen = frame.copy()
+        if disposal == DISPOSE_BACKGROUND:
+            screen[top:bottom, left:right] = TRANSPARENT_INDEX
+        self._screen = screen
+
@@ -0,0 +1,259 @@
+"""
+渲染任务队列
+把渲染放到固定数量的工作线程中执行，排队任务数有上限。
+每个任务报告已渲染和已编码的帧数，可以随时取消：取消后在下一帧前中止效果生成器和编码器，
+无人查询进度的任务（如用户已关闭页面）视为被放弃，同样会被取消。
+设置内存预算后，任务按预测的峰值内存占用预算，预算不足时保持排队，等前面的任务结束后再开始
+"""
+
+import collections
+import itertools
+import os
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from .pipeline import RenderCancelled
+
+# 任务状态
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+MAX_PENDING = 16
+# 超过该时间没有被查询进度的任务视为被放弃
+ABANDON_AFTER_SEC = 10.0
+
+
+class QueueFull(Exception):
+    """排队的任务数已达上限"""
+
+
+class Job:
+    """
+    一个渲染任务。
+
+    工作线程通过 report() 更新进度，并在任务被取消或放弃时得到 RenderCancelled；
+    调用方通过 wait() 等待任务结束，同时表明自己仍在关注该任务。
+    """
+
+    def __init__(self, job_id: int, fn: Callable[["Job"], Any], total_frames: int = 0,
+                 abandon_after_sec: Optional[float] = ABANDON_AFTER_SEC, memory_bytes: int = 0,
+                 info: Optional[Dict[str, Any]] = None):
+        self.id = job_id
+        self.fn = fn
+        self.total_frames = total_frames
+        self.memory_bytes = memory_bytes
+        self.info = info or {}
+        self.abandon_after_sec = abandon_after_sec
+        self.status = QUEUED
+        self.rendered = 0
+        self.encoded = 0
+        self.result: Any = None
+        self.error: Optional[str] = None
+        self.created = time.monotonic()
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self._cancelled = threading.Event()
+        self._finished = threading.Event()
+        self._last_seen = self.created
+
+    @property
+    def done(self) -> bool:
+        return self.status in (DONE, FAILED, CANCELLED)
+
+    def cancel(self) -> None:
+        """请求取消：排队中的任务不再执行，运行中的任务在下一帧前中止"""
+        self._cancelled.set()
+
+    def cancel_requested(self) -> bool:
+        """是否已被取消，或长时间无人查询而被放弃"""
+        if self._cancelled.is_set():
+            return True
+        if self.abandon_after_sec is not None and time.monotonic() - self._last_seen > self.abandon_after_sec:
+            self._cancelled.set()
+            return True
+        return False
+
+    def report(self, rendered: int, encoded: int) -> None:
+        """更新帧进度，作为 make_animation 的 on_frame 回调；任务被取消时抛出 RenderCancelled"""
+        if self.cancel_requested():
+            raise RenderCancelled()
+        self.rendered, self.encoded = rendered, encoded
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """
+        等待任务结束，同时刷新“仍在关注”的时间；调用方应以短于 abandon_after_sec 的间隔轮询。
+
+        Returns:
+            任务是否已结束
+        """
+        self.touch()
+        finished = self._finished.wait(timeout)
+        self.touch()
+        return finished
+
+    def touch(self) -> None:
+        """表明调用方仍在关注该任务，不把它当作被放弃"""
+        self._last_seen = time.monotonic()
+
+    def snapshot(self) -> Dict[str, Any]:
+        """当前状态与进度，以及提交时附加的信息"""
+        return {
+            **self.info,
+            "id": self.id,
+            "status": self.status,
+            "rendered": self.rendered,
+            "encoded": self.encoded,
+            "total_frames": self.total_frames,
+            "memory_bytes": self.memory_bytes,
+            "error": self.error,
+        }
+
+    def _run(self) -> None:
+        if self.cancel_requested():
+            self._finish(CANCELLED)
+            return
+        self.status = RUNNING
+        self.started = time.monotonic()
+        try:
+            self.result = self.fn(self)
+        except RenderCancelled:
+            self._finish(CANCELLED)
+        except Exception as exc:
+            self.error = f"{type(exc).__name__}: {exc}"
+            self._finish(FAILED)
+        else:
+            self._finish(DONE)
+
+    def _finish(self, status: str) -> None:
+        self.status = status
+        self.finished = time.monotonic()
+        # 释放任务函数引用的源图像等数据
+        self.fn = None
+        self._finished.set()
+
+
+class JobQueue:
+    """
+    有界的渲染任务队列。
+
+    workers 个工作线程按提交顺序执行任务，排队中（尚未开始）的任务最多 max_pending 个，
+    超出时 submit() 抛出 QueueFull，避免请求无限堆积；已取消或被放弃的排队任务不占名额，
+    轮到时直接跳过。工作线程在首次提交时启动。
+
+    memory_budget 大于 0 时，运行中任务的 memory_bytes 之和不超过该值：轮到的任务预算不足时
+    继续排队，直到有任务结束（没有其他任务运行时总会开始，避免超大任务永远等待）。
+    """
+
+    def __init__(self, workers: Optional[int] = None, max_pending: int = MAX_PENDING,
+                 abandon_after_sec: Optional[float] = ABANDON_AFTER_SEC, memory_budget: int = 0):
+        self.workers = workers or os.cpu_count() or 1
+        self.max_pending = max_pending
+        self.abandon_after_sec = abandon_after_sec
+        self.memory_budget = memory_budget
+        self._reserved = 0
+        self._released = threading.Condition()
+        # 等待内存预算的任务按到达顺序排队，先到的任务先获得预算
+        self._reserve_line: "collections.deque[Job]" = collections.deque()
+        self._queue: "queue.Queue[Optional[Job]]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._threads: List[threading.Thread] = []
+        self._ids = itertools.count(1)
+        self._jobs: Dict[int, Job] = {}
+
+    def submit(self, fn: Callable[[Job], Any], total_frames: int = 0, watched: bool = True,
+               memory_bytes: int = 0, info: Optional[Dict[str, Any]] = None) -> Job:
+        """
+        提交任务。
+
+        Args:
+            fn: 任务函数，接收 Job，可把 job.report 作为 on_frame 传给 make_animation；返回值存入 job.result
+            total_frames: 预计的总帧数，仅用于显示进度
+            watched: 调用方是否会持续轮询；为 False 时（如稍后再取结果的异步请求）不按放弃处理
+            memory_bytes: 预测的峰值内存，运行期间从内存预算中扣除
+            info: 附加在任务状态中的信息（如准入控制的结果）
+
+        Returns:
+            新任务
+        """
+        with self._lock:
+            if self._waiting() >= self.max_pending:
+                raise QueueFull(f"排队任务已达上限 ({self.max_pending})")
+            job = Job(next(self._ids), fn, total_frames, self.abandon_after_sec if watched else None, memory_bytes,
+                      info)
+            self._jobs[job.id] = job
+            if not self._threads:
+                for index in range(self.workers):
+                    thread = threading.Thread(target=self._work, name=f"render-job-{index}", daemon=True)
+                    thread.start()
+                    self._threads.append(thread)
+        self._queue.put(job)
+        return job
+
+    def get(self, job_id: int) -> Optional[Job]:
+        """按编号查找排队中或运行中的任务"""
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def stats(self) -> Dict[str, int]:
+        """排队中、运行中的任务数，以及运行中任务占用的内存预算"""
+        with self._lock:
+            running = sum(1 for job in self._jobs.values() if job.status == RUNNING)
+            stats = {"workers": self.workers, "pending": self._waiting(), "running": running}
+        with self._released:
+            stats.update(memory_reserved=self._reserved, memory_budget=self.memory_budget)
+        return stats
+
+    def shutdown(self) -> None:
+        """取消所有未结束的任务并停止工作线程"""
+        with self._lock:
+            jobs = list(self._jobs.values())
+            threads, self._threads = self._threads, []
+        for job in jobs:
+            job.cancel()
+        for _ in threads:
+            self._queue.put(None)
+        for thread in threads:
+            thread.join()
+
+    def _waiting(self) -> int:
+        """排队中且未被取消的任务数（调用方持有锁）"""
+        return sum(1 for job in self._jobs.values() if job.status == QUEUED and not job.cancel_requested())
+
+    def _work(self) -> None:
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            reserved = self._reserve(job)
+            try:
+                job._run()
+            finally:
+                with self._lock:
+                    self._jobs.pop(job.id, None)
+                with self._released:
+                    self._reserved -= reserved
+                    self._released.notify_all()
+
+    def _reserve(self, job: Job) -> int:
+        """等待内存预算足够运行该任务，返回扣除的预算；任务在等待中被取消时不扣除"""
+        if not self.memory_budget or not job.memory_bytes:
+            return 0
+        with self._released:
+            self._reserve_line.append(job)
+            try:
+                while not job.cancel_requested():
+                    if self._reserve_line[0] is job and (
+                            not self._reserved or self._reserved + job.memory_bytes <= self.memory_budget):
+                        self._reserved += job.memory_bytes
+                        return job.memory_bytes
+                    # 定期醒来检查任务是否已被取消或放弃
+                    self._released.wait(0.5)
+                return 0
+            finally:
+                self._reserve_line.remove(job)
+                self._released.notify_all()
@@ -0,0 +1,298 @@
+"""
+渲染指标
+记录每次生成动画的分阶段耗时、帧数、尺寸、输出字节数和内存占用，
+通过可插拔的输出端（日志、JSON Lines、Prometheus 文本文件）上报。
+未注册输出端时只做几次计时调用，开销可以忽略，适合在生产环境常开
+"""
+
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Union
+
+logger = logging.getLogger("animation.metrics")
+
+
+@dataclass
+class RenderMetrics:
+    """一次动画生成的指标记录"""
+    effect: str = ""
+    fmt: str = ""
+    duration_sec: float = 0.0
+    fps: int = 0
+    frames: int = 0
+    width: int = 0
+    height: int = 0
+    bytes_out: int = 0
+    # 缓存状态：hit / miss / off
+    cache: str = "off"
+    # 各阶段耗时（秒），如 convert / cache / render / encode / store
+    stages: Dict[str, float] = field(default_factory=dict)
+    # 结束时的进程常驻内存
+    rss_bytes: int = 0
+    # 本次渲染期间（开始时及每产出一帧时采样）观测到的常驻内存峰值，及其相对开始时的增量；
+    # 同一进程中并发的其他渲染也计入常驻内存，增量只能近似本次渲染的占用
+    rss_start_bytes: int = 0
+    peak_rss_bytes: int = 0
+    peak_rss_delta_bytes: int = 0
+    error: Optional[str] = None
+    timestamp: float = field(default_factory=time.time)
+
+    @contextmanager
+    def stage(self, name: str):
+        """累计代码块耗时到指定阶段"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + time.perf_counter() - start
+
+    def add(self, name: str, seconds: float) -> None:
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def start_memory(self) -> None:
+        """开始跟踪本次渲染的内存，之后每产出一帧采样一次常驻内存"""
+        self.rss_start_bytes = self.peak_rss_bytes = current_rss()
+
+    def sample_peak(self) -> None:
+        """采样常驻内存，更新本次渲染的峰值"""
+        rss = current_rss()
+        if rss > self.peak_rss_bytes:
+            self.peak_rss_bytes = rss
+            self.peak_rss_delta_bytes = rss - self.rss_start_bytes if self.rss_start_bytes else 0
+
+    def sample_memory(self) -> None:
+        """记录结束时的常驻内存"""
+        self.rss_bytes = current_rss()
+        if self.rss_start_bytes:
+            self.sample_peak()
+
+    def to_dict(self) -> Dict:
+        record = asdict(self)
+        record["stages"] = {name: round(seconds, 6) for name, seconds in self.stages.items()}
+        return record
+
+
+class TimedFrames:
+    """包装帧生成器，累计花在产出帧（渲染）上的时间和帧数"""
+
+    def __init__(self, frames: Iterator, metrics: RenderMetrics, stage: str = "render"):
+        self._frames = iter(frames)
+        self._metrics = metrics
+        self._stage = stage
+
+    def __iter__(self) -> "TimedFrames":
+        return self
+
+    def __next__(self):
+        start = time.perf_counter()
+        try:
+            frame = next(self._frames)
+        finally:
+            self._metrics.add(self._stage, time.perf_counter() - start)
+        self._metrics.frames += 1
+        if self._metrics.rss_start_bytes:
+            self._metrics.sample_peak()
+        return frame
+
+
+def current_rss() -> int:
+    """当前进程的常驻内存字节数，无法获取时返回 0"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return 0
+
+
+# -------------- 输出端 -------------- #
+
+Sink = Callable[[RenderMetrics], None]
+
+
+class LoggingSink:
+    """以一行结构化日志输出每条记录"""
+
+    def __init__(self, log: logging.Logger = logger, level: int = logging.INFO):
+        self.log = log
+        self.level = level
+
+    def __call__(self, metrics: RenderMetrics) -> None:
+        self.log.log(self.level, "render %s", json.dumps(metrics.to_dict(), ensure_ascii=False))
+
+
+class JsonLinesSink:
+    """每条记录追加为 JSON Lines 文件中的一行"""
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+
+    def __call__(self, metrics: RenderMetrics) -> None:
+        line = json.dumps(metrics.to_dict(), ensure_ascii=False) + "\n"
+        with self._lock:
+            with self.path.open("a", encoding="utf-8") as f:
+                f.write(line)
+
+
+def _labels(**values) -> str:
+    """按 Prometheus 文本格式拼接标签，值中的反斜杠、双引号和换行需要转义"""
+    def escape(value) -> str:
+        return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return ",".join(f'{name}="{escape(value)}"' for name, value in values.items())
+
+
+class PrometheusTextSink:
+    """
+    聚合为 Prometheus 文本格式，供 node_exporter 的 textfile collector 采集。
+
+    文件以原子替换方式写出，且最多每 min_interval_sec 秒写一次；间隔内到达的记录
+    由定时器在间隔结束时写出，close() 时（以及进程退出时）立即写出尚未落盘的记录。
+    """
+
+    def __init__(self, path: Union[str, Path], min_interval_sec: float = 1.0):
+        self.path = Path(path)
+        self.min_interval_sec = min_interval_sec
+        self._lock = threading.Lock()
+        self._last_write = 0.0
+        self._timer: Optional[threading.Timer] = None
+        self._dirty = False
+        self._requests = defaultdict(int)
+        self._stage_sum = defaultdict(float)
+        self._stage_count = defaultdict(int)
+        self._frames = defaultdict(int)
+        self._bytes = defaultdict(int)
+        self._rss = 0
+
+    def __call__(self, metrics: RenderMetrics) -> None:
+        labels = (metrics.effect, metrics.fmt)
+        with self._lock:
+            self._requests[labels + (metrics.cache, "error" if metrics.error else "ok")] += 1
+            for name, seconds in metrics.stages.items():
+                self._stage_sum[labels + (name,)] += seconds
+                self._stage_count[labels + (name,)] += 1
+            self._frames[labels] += metrics.frames
+            self._bytes[labels] += metrics.bytes_out
+            self._rss = metrics.rss_bytes or self._rss
+            self._dirty = True
+            wait = self._last_write + self.min_interval_sec - time.monotonic()
+            if wait <= 0:
+                self._flush()
+            elif self._timer is None:
+                self._timer = threading.Timer(wait, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def flush(self) -> None:
+        """立即写出尚未落盘的记录"""
+        with self._lock:
+            self._flush()
+
+    def close(self) -> None:
+        """取消定时器并写出剩余的记录"""
+        self.flush()
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._dirty:
+            self._dirty = False
+            self._last_write = time.monotonic()
+            self._write()
+
+    def _write(self) -> None:
+        lines = [
+            "# HELP animation_requests_total Animation render requests.",
+            "# TYPE animation_requests_total counter",
+        ]
+        for (effect, fmt, cache, status), count in sorted(self._requests.items()):
+            label = _labels(effect=effect, format=fmt, cache=cache, status=status)
+            lines.append(f"animation_requests_total{{{label}}} {count}")
+        lines += [
+            "# HELP animation_stage_seconds Time spent per render stage.",
+            "# TYPE animation_stage_seconds summary",
+        ]
+        for (effect, fmt, stage), total in sorted(self._stage_sum.items()):
+            label = _labels(effect=effect, format=fmt, stage=stage)
+            lines.append(f"animation_stage_seconds_sum{{{label}}} {total:.6f}")
+            lines.append(f"animation_stage_seconds_count{{{label}}} {self._stage_count[(effect, fmt, stage)]}")
+        lines += ["# TYPE animation_frames_total counter"]
+        for (effect, fmt), count in sorted(self._frames.items()):
+            lines.append(f"animation_frames_total{{{_labels(effect=effect, format=fmt)}}} {count}")
+        lines += ["# TYPE animation_output_bytes_total counter"]
+        for (effect, fmt), count in sorted(self._bytes.items()):
+            lines.append(f"animation_output_bytes_total{{{_labels(effect=effect, format=fmt)}}} {count}")
+        lines += ["# TYPE animation_process_rss_bytes gauge", f"animation_process_rss_bytes {self._rss}"]
+
+        tmp_path = self.path.with_name(f".{self.path.name}.tmp")
+        tmp_path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+        os.replace(tmp_path, self.path)
+
+
+# -------------- 注册与上报 -------------- #
+
+_sinks: List[Sink] = []
+_sinks_lock = threading.Lock()
+
+
+def add_sink(sink: Sink) -> None:
+    """注册一个输出端"""
+    with _sinks_lock:
+        _sinks.append(sink)
+
+
+def remove_sink(sink: Sink) -> None:
+    """移除已注册的输出端，输出端有 close() 时一并关闭"""
+    with _sinks_lock:
+        if sink in _sinks:
+            _sinks.remove(sink)
+    close = getattr(sink, "close", None)
+    if close is not None:
+        close()
+
+
+def enabled() -> bool:
+    return bool(_sinks)
+
+
+def emit(metrics: RenderMetrics) -> None:
+    """将记录交给所有输出端，单个输出端出错不影响请求本身"""
+    with _sinks_lock:
+        sinks = list(_sinks)
+    if not sinks:
+        return
+    metrics.sample_memory()
+    for sink in sinks:
+        try:
+            sink(metrics)
+        except Exception:
+            logger.exception("指标输出失败: %r", sink)
+
+
+def configure_from_env(value: Optional[str] = None) -> None:
+    """
+    按环境变量 ANIMATION_METRICS 注册输出端，多个输出端用逗号分隔：
+    log、jsonl:<路径>、prom:<路径>
+    """
+    value = os.environ.get("ANIMATION_METRICS", "") if value is None else value
+    for spec in filter(None, (item.strip() for item in value.split(","))):
+        kind, _, path = spec.partition(":")
+        if kind == "log":
+            add_sink(LoggingSink())
+        elif kind == "jsonl" and path:
+            add_sink(JsonLinesSink(path))
+        elif kind == "prom" and path:
+            sink = PrometheusTextSink(path)
+            add_sink(sink)
+            # 进程退出时写出最后一个间隔内的记录
+            atexit.register(sink.close)
+        else:
+            raise ValueError(f"无法识别的指标输出端: {spec}")
@@ -0,0 +1,306 @@
+"""
+动画生成流水线
+make_animation 等生成入口，不依赖 Gradio，可供界面、批处理等入口共用；
+效果注册表见 animations.registry，这里的 EFFECTS 即注册表中名称到效果函数的映射
+"""
+
+import time
+from functools import partial
+from typing import Callable, Dict, Iterable, Iterator, Optional, Sequence, Tuple
+
+from PIL import Image
+
+from animations.registry import EFFECTS, REGISTRY
+from animations.timeline import EASINGS, Segment, render_timeline
+from .cache import AnimationCache, cache_key
+from .encoders import encode_apng, encode_gif, encode_mp4, encode_webm, encode_webp
+from . import metrics as render_metrics
+from .metrics import RenderMetrics, TimedFrames
+from .timing import exact_frames, frame_count, frame_rate
+
+# 支持的输出格式及其 MIME 类型
+FORMATS = {
+    "GIF": "image/gif",
+    "MP4": "video/mp4",
+    "WEBM": "video/webm",
+    "WEBP": "image/webp",
+    "APNG": "image/apng",
+}
+
+# 进程内共享的结果缓存
+RESULT_CACHE = AnimationCache()
+
+# 默认的最大输出分辨率（长边像素），更大的上传图片在渲染前先缩小
+MAX_OUTPUT_SIZE = 1024
+# 界面和 API 允许设置的最大输出分辨率上限（长边像素）
+MAX_OUTPUT_LIMIT = 2048
+
+# 快速预览的分辨率和帧率上限；预览结果只缓存在内存中
+PREVIEW_MAX_SIZE = 256
+PREVIEW_MAX_FPS = 12
+PREVIEW_CACHE = AnimationCache(cache_dir=None, max_memory_bytes=32 * 1024 * 1024)
+
+
+class RenderCancelled(Exception):
+    """渲染被取消，由 on_frame 回调抛出以中止正在进行的渲染"""
+
+
+def make_animation(img: Image.Image, effect_name: str, fmt: str, duration_sec: float = 1.0, fps: int = 15,
+                   cache: Optional[AnimationCache] = RESULT_CACHE,
+                   metrics: Optional[RenderMetrics] = None,
+                   max_size: Optional[int] = MAX_OUTPUT_SIZE,
+                   quality: int = 80, lossless: bool = False, method: Optional[int] = None,
+                   video_profile: str = "default", threads: Optional[int] = None, loop: int = 1,
+                   on_frame: Optional[Callable[[int, int], None]] = None) -> Tuple[bytes, str]:
+    """
+    根据选择的效果生成动画，并返回指定格式的数据。
+    
+    Args:
+        img: 输入图像
+        effect_name: 效果名称
+        fmt: 输出格式 ("GIF"、"MP4"、"WebM"、"WebP" 或 "APNG"，不区分大小写；无法识别时按 MP4 输出)
+        duration_sec: 动画持续时间（秒）
+        fps: 每秒帧数
+        cache: 结果缓存，相同像素和参数的请求直接返回缓存结果；传 None 则不使用缓存
+        metrics: 指标记录，由调用方传入时只填充、由调用方负责上报；
+            不传时在本函数内创建并上报到已注册的输出端
+        max_size: 输出的最大长边（像素），源图更大时先等比缩小再渲染；0 或 None 表示不限制
+        quality: WebP 的质量 (0-100)，有损时为画质，无损时为压缩力度
+        lossless: WebP 是否无损编码（APNG 总是无损）
+        method: WebP 编码速度与压缩率的权衡 (0-6)，None 时按是否无损取默认值
+        video_profile: MP4 / WebM 的编码档位 ("preview"、"default" 或 "final")，
+            在编码速度与文件体积之间取舍
+        threads: MP4 / WebM 的编码线程数，None 时由 ffmpeg 自动决定
+        loop: WebP / APNG 的播放次数，0 为无限循环
+        on_frame: 进度回调，每渲染出一帧、每编码完一帧后以 (已渲染帧数, 已编码帧数) 调用；
+            在其中抛出 RenderCancelled 可中止渲染和编码
+        
+    Returns:
+        动画数据和MIME类型
+    """
+    # 获取对应的效果函数
+    effect_fn = EFFECTS.get(effect_name)
+    if effect_fn is None:
+        return None, None
+    options = _format_options(fmt, quality, lossless, method, video_profile, threads, loop)
+    return _run_animation(img, effect_name, effect_fn, fmt, duration_sec, fps, cache, metrics, max_size, options,
+                          on_frame)
+
+
+def make_timeline(img: Image.Image, segments: Sequence[Tuple], fmt: str, fps: int = 15,
+                  cache: Optional[AnimationCache] = RESULT_CACHE,
+                  metrics: Optional[RenderMetrics] = None,
+                  max_size: Optional[int] = MAX_OUTPUT_SIZE,
+                  quality: int = 80, lossless: bool = False, method: Optional[int] = None,
+                  video_profile: str = "default", threads: Optional[int] = None, loop: int = 1,
+                  on_frame: Optional[Callable[[int, int], None]] = None) -> Tuple[bytes, str]:
+    """
+    把多个效果按顺序串联成一个动画（如 淡入 → 脉冲 → 淡出），一次渲染、一次编码。
+
+    各段共用同一张预处理后的源图，每帧由各段的运动轨迹直接算出一次仿射变换，
+    串联不会引入额外的重采样；总时长为各段时长之和。
+
+    Args:
+        img: 输入图像
+        segments: 各段的 (效果名称, 时长秒数) 或 (效果名称, 时长秒数, 缓动曲线)，
+            缓动曲线见 animations.timeline.EASINGS，默认 "linear"
+        fmt: 输出格式，同 make_animation
+        其余参数同 make_animation
+
+    Returns:
+        动画数据和MIME类型
+
+    Raises:
+        ValueError: 效果名称、缓动曲线或时长无效
+    """
+    timeline = []
+    for segment in segments:
+        name, duration_sec, *rest = segment
+        easing = rest[0] if rest else "linear"
+        if name not in EFFECTS:
+            raise ValueError(f"未知的效果: {name}")
+        if easing not in EASINGS:
+            raise ValueError(f"未知的缓动曲线: {easing}（可选 {', '.join(EASINGS)}）")
+        if not duration_sec > 0:
+            raise ValueError(f"效果 {name} 的时长必须大于 0")
+        timeline.append((name, float(duration_sec), easing))
+    if not timeline:
+        raise ValueError("时间轴至少需要一段")
+
+    # 规范化后的各段描述同时作为指标中的效果名和缓存键的一部分
+    label = " → ".join(f"{name}({duration_sec}s,{easing})" for name, duration_sec, easing in timeline)
+    effect_fn = partial(render_timeline, segments=[Segment(REGISTRY[name].function, duration_sec, easing)
+                                                   for name, duration_sec, easing in timeline])
+    options = _format_options(fmt, quality, lossless, method, video_profile, threads, loop)
+    return _run_animation(img, label, effect_fn, fmt, sum(segment[1] for segment in timeline), fps, cache, metrics,
+                          max_size, options, on_frame)
+
+
+def _format_options(fmt: str, quality: int, lossless: bool, method: Optional[int], video_profile: str,
+                    threads: Optional[int], loop: int) -> Dict:
+    """只把对应格式使用的编码选项传给编码器并计入缓存键"""
+    fmt = normalize_format(fmt)
+    if fmt == "WEBP":
+        return {"quality": int(quality), "lossless": bool(lossless), "method": method, "loop": int(loop)}
+    if fmt == "APNG":
+        return {"loop": int(loop)}
+    if fmt in ("MP4", "WEBM"):
+        return {"video_profile": video_profile, "threads": threads}
+    return {}
+
+
+def _run_animation(img: Image.Image, effect_name: str, effect_fn, fmt: str, duration_sec: float, fps: int,
+                   cache: Optional[AnimationCache], metrics: Optional[RenderMetrics],
+                   max_size: Optional[int], options: Dict,
+                   on_frame: Optional[Callable[[int, int], None]]) -> Tuple[bytes, str]:
+    """记录指标并生成动画，未传入 metrics 时在结束后上报"""
+    owns_metrics = metrics is None
+    if owns_metrics:
+        metrics = RenderMetrics()
+    fmt = normalize_format(fmt)
+    metrics.effect, metrics.fmt = effect_name, fmt
+    metrics.duration_sec, metrics.fps = float(duration_sec), int(fps)
+    if render_metrics.enabled():
+        # 只在有输出端时逐帧采样内存
+        metrics.start_memory()
+    try:
+        data, mime = _make_animation(img, effect_fn, fmt, duration_sec, fps, cache, metrics, max_size, options,
+                                     on_frame)
+        metrics.bytes_out = len(data)
+        return data, mime
+    except Exception as exc:
+        metrics.error = f"{type(exc).__name__}: {exc}"
+        raise
+    finally:
+        if owns_metrics:
+            render_metrics.emit(metrics)
+
+
+def _make_animation(img: Image.Image, effect_fn, fmt: str, duration_sec: float, fps: int,
+                    cache: Optional[AnimationCache], metrics: RenderMetrics,
+                    max_size: Optional[int], options: Dict,
+                    on_frame: Optional[Callable[[int, int], None]] = None) -> Tuple[bytes, str]:
+    # 先缩小到输出分辨率，之后的转换、缓存哈希、渲染和编码都只处理输出尺寸的像素
+    with metrics.stage("downscale"):
+        img = limit_size(img, max_size)
+    metrics.width, metrics.height = img.size
+
+    # 确保输入图像是高质量的RGBA模式，已是RGBA的图像直接共享，不再拷贝
+    with metrics.stage("convert"):
+        img_rgba = img if img.mode == "RGBA" else img.convert("RGBA")
+
+    if cache is None:
+        return _render_animation(img_rgba, effect_fn, fmt, duration_sec, fps, metrics, on_frame, **options)
+
+    with metrics.stage("cache"):
+        # 线程数只影响编码速度，不计入缓存键
+        params = {name: value for name, value in options.items() if name != "threads"}
+        key = cache_key(img_rgba, effect_name=metrics.effect, fmt=metrics.fmt,
+                        duration_sec=float(duration_sec), fps=int(fps), **params)
+        cached = cache.get(key)
+    if cached is not None:
+        metrics.cache = "hit"
+        return cached
+
+    metrics.cache = "miss"
+    data, mime = _render_animation(img_rgba, effect_fn, fmt, duration_sec, fps, metrics, on_frame, **options)
+    with metrics.stage("cache"):
+        cache.put(key, data, mime)
+    return data, mime
+
+
+def make_preview(img: Image.Image, effect_name: str, duration_sec: float = 1.0, fps: int = 15,
+                 on_frame: Optional[Callable[[int, int], None]] = None,
+                 metrics: Optional[RenderMetrics] = None) -> Tuple[bytes, str]:
+    """
+    生成低分辨率、低帧率的快速预览（循环播放的有损动画 WebP，保留透明度）。
+
+    长边不超过 PREVIEW_MAX_SIZE、帧率不超过 PREVIEW_MAX_FPS，通常远小于一秒即可完成；
+    参数与 make_animation 相同，结果缓存在独立的内存缓存中。
+    """
+    return make_animation(img, effect_name, "WEBP", duration_sec, min(int(fps), PREVIEW_MAX_FPS),
+                          cache=PREVIEW_CACHE, metrics=metrics, max_size=PREVIEW_MAX_SIZE, quality=60, method=0,
+                          loop=0, on_frame=on_frame)
+
+
+def normalize_format(fmt: str) -> str:
+    """将格式名规范为 FORMATS 中的键，无法识别的格式按 MP4 处理"""
+    fmt = fmt.upper()
+    return fmt if fmt in FORMATS else "MP4"
+
+
+def limit_size(img: Image.Image, max_size: Optional[int]) -> Image.Image:
+    """
+    将图像等比缩小到长边不超过 max_size，未超出时原样返回。
+
+    先按整数倍做盒式缩小，再用 LANCZOS 缩放到目标尺寸（reducing_gap），
+    大图缩小的速度接近盒式滤波，画质与直接 LANCZOS 相当。
+    """
+    if not max_size or max(img.size) <= max_size:
+        return img
+    scale = max_size / max(img.size)
+    size = (max(1, round(img.width * scale)), max(1, round(img.height * scale)))
+    if img.mode not in ("RGB", "RGBA", "L", "LA"):
+        # 调色板等模式无法做插值缩放
+        img = img.convert("RGBA")
+    return img.resize(size, Image.LANCZOS, reducing_gap=3.0)
+
+
+def _render_animation(img_rgba: Image.Image, effect_fn, fmt: str, duration_sec: float, fps: int,
+                      metrics: Optional[RenderMetrics] = None,
+                      on_frame: Optional[Callable[[int, int], None]] = None, quality: int = 80,
+                      lossless: bool = False, method: Optional[int] = None, video_profile: str = "default",
+                      threads: Optional[int] = None, loop: int = 1) -> Tuple[bytes, str]:
+    """渲染并编码动画，传入 metrics 时记录渲染与编码耗时和帧数"""
+    # 计算总帧数，效果函数返回惰性生成器，逐帧送入编码器；
+    # 帧数与时间轴严格对应，编码器据此给出每帧精确的时间戳
+    num_frames = frame_count(duration_sec, fps)
+    effect_frames = effect_fn(img_rgba, num_frames=num_frames)
+    frames = exact_frames(effect_frames, num_frames)
+    if on_frame is not None:
+        frames = _notify_frames(frames, on_frame)
+    if metrics is not None:
+        # 渲染与编码交错进行：产出帧的时间计入 render，其余计入 encode
+        frames = TimedFrames(frames, metrics)
+        render_before = metrics.stages.get("render", 0.0)
+        start = time.perf_counter()
+
+    # 计算每帧延迟（秒）；视频按同一时间轴换算为有理数帧率，各格式的总时长一致
+    frame_delay = duration_sec / num_frames
+    rate = frame_rate(num_frames, duration_sec)
+    fmt = normalize_format(fmt)
+    try:
+        if fmt == "GIF":
+            # 源图参与构建全局调色板，覆盖首帧中尚未出现的颜色（如淡入、放大的首帧）
+            data = encode_gif(frames, frame_delay, palette_source=img_rgba)
+        elif fmt == "WEBP":
+            data = encode_webp(frames, frame_delay, lossless=lossless, quality=quality, method=method, loop=loop)
+        elif fmt == "APNG":
+            data = encode_apng(frames, frame_delay, loop=loop)
+        elif fmt == "WEBM":
+            data = encode_webm(frames, rate, profile=video_profile, threads=threads)
+        else:  # MP4
+            # 帧经管道逐帧送入 ffmpeg，编码结果直接收集在内存中
+            data = encode_mp4(frames, rate, profile=video_profile, threads=threads)
+    finally:
+        # 编码中途出错或被取消时立即结束效果生成器，释放其共享内存、进程池任务等资源
+        close = getattr(effect_frames, "close", None)
+        if close is not None:
+            close()
+    result = data, FORMATS[fmt]
+
+    if metrics is not None:
+        render_sec = metrics.stages.get("render", 0.0) - render_before
+        metrics.add("encode", time.perf_counter() - start - render_sec)
+    return result
+
+
+def _notify_frames(frames: Iterable, on_frame: Callable[[int, int], None]) -> Iterator:
+    """
+    报告帧进度：产出一帧前报告其已渲染，编码器取下一帧时报告上一帧已编码。
+    回调抛出的异常会中止编码
+    """
+    for count, frame in enumerate(frames, start=1):
+        on_frame(count, count - 1)
+        yield frame
+        on_frame(count, count)
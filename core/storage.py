@@ -0,0 +1,114 @@
+"""
+输出文件存储
+每个请求写入独立的唯一文件名，先写临时文件再原子重命名，
+后台线程按文件年龄和总字节数定期清理旧文件
+"""
+
+import os
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Optional, Union
+
+OUTPUT_DIR = Path("outputs")
+PREFIX = "animation-"
+MAX_AGE_SEC = 60 * 60
+MAX_TOTAL_BYTES = 512 * 1024 * 1024
+# 刚写入的文件可能还在被前端下载，即使超出总字节数也暂不删除
+MIN_AGE_SEC = 60
+CLEANUP_INTERVAL_SEC = 60
+
+
+class OutputStore:
+    """
+    并发安全的输出文件存储。
+
+    文件名由 uuid 生成，不同请求之间不会互相覆盖；写入过程中的文件使用
+    临时名，重命名完成后才对外可见，因此不会读到写了一半的文件。
+    只有本存储生成的文件（以 PREFIX 开头）才会被清理。
+    """
+
+    def __init__(self, output_dir: Union[str, Path] = OUTPUT_DIR, max_age_sec: float = MAX_AGE_SEC,
+                 max_total_bytes: int = MAX_TOTAL_BYTES, min_age_sec: float = MIN_AGE_SEC,
+                 cleanup_interval_sec: float = CLEANUP_INTERVAL_SEC):
+        self.output_dir = Path(output_dir)
+        self.max_age_sec = max_age_sec
+        self.max_total_bytes = max_total_bytes
+        self.min_age_sec = min_age_sec
+        self.cleanup_interval_sec = cleanup_interval_sec
+        self._lock = threading.Lock()
+        self._cleaner: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+
+    def save(self, data: bytes, suffix: str) -> Path:
+        """
+        原子地写入一个新的输出文件。
+
+        Args:
+            data: 文件内容
+            suffix: 扩展名，如 ".gif"
+
+        Returns:
+            新文件的路径
+        """
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        name = f"{PREFIX}{uuid.uuid4().hex}{suffix}"
+        path = self.output_dir / name
+        tmp_path = self.output_dir / f".{name}.tmp"
+        try:
+            tmp_path.write_bytes(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            tmp_path.unlink(missing_ok=True)
+            raise
+        self._ensure_cleaner()
+        return path
+
+    def cleanup(self) -> int:
+        """按保留策略删除旧文件，返回删除的文件数"""
+        if not self.output_dir.exists():
+            return 0
+
+        now = time.time()
+        entries = []
+        for path in self.output_dir.iterdir():
+            if not path.name.startswith(PREFIX) or not path.is_file():
+                continue
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        removed = 0
+        total = sum(size for _, size, _ in entries)
+        for mtime, size, path in sorted(entries, key=lambda entry: entry[0]):
+            age = now - mtime
+            if age < self.min_age_sec:
+                break
+            if age <= self.max_age_sec and total <= self.max_total_bytes:
+                break
+            try:
+                path.unlink()
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+        return removed
+
+    def stop(self) -> None:
+        """停止后台清理线程"""
+        self._stopped.set()
+
+    def _ensure_cleaner(self) -> None:
+        with self._lock:
+            if self._cleaner is not None and self._cleaner.is_alive():
+                return
+            self._stopped.clear()
+            self._cleaner = threading.Thread(target=self._cleanup_loop, name="output-cleanup", daemon=True)
+            self._cleaner.start()
+
+    def _cleanup_loop(self) -> None:
+        while not self._stopped.wait(self.cleanup_interval_sec):
+            self.cleanup()
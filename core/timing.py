@@ -0,0 +1,111 @@
+"""
+帧时间轴
+按动画时长与帧数给出每帧精确的起止时间戳，并把连续重复的帧合并为一段：
+编码器对每段只写出一帧，延迟取整段的时长（可变帧延迟），静止的片段不再逐帧编码
+"""
+
+from fractions import Fraction
+from typing import Iterable, Iterator, NamedTuple
+
+from animations.frames import Frame
+
+
+class TimedFrame(NamedTuple):
+    """时间轴上的一段：帧及其起止时间（单位由调用方给出，如毫秒或百分之一秒）"""
+    frame: Frame
+    start: int
+    end: int
+
+    @property
+    def delay(self) -> int:
+        return self.end - self.start
+
+
+def frame_count(duration_sec: float, fps: float) -> int:
+    """
+    动画的总帧数：时长 × 帧率四舍五入，至少一帧。
+
+    直接截断会因浮点误差丢帧（如 4.1 秒 × 30 fps 得到 122.99…），
+    所有格式都由这一个帧数驱动，总时长保持一致。
+    """
+    return max(round(duration_sec * fps), 1)
+
+
+def frame_rate(num_frames: int, duration_sec: float) -> Fraction:
+    """
+    恰好在 duration_sec 内播放 num_frames 帧的有理数帧率，供恒定帧率的视频编码器使用。
+
+    时长按其十进制表示换算（4.1 秒即 41/10），避免二进制浮点的尾差。
+    """
+    return Fraction(num_frames) / Fraction(repr(float(duration_sec)))
+
+
+def frame_timestamp(index: int, frame_delay: float, unit: int = 1000) -> int:
+    """
+    第 index 帧的起始时间，以 1 / unit 秒为单位。
+
+    按累计时间取整，舍入误差不会随帧数累积，总时长保持准确。
+    """
+    return round(index * frame_delay * unit)
+
+
+def exact_frames(frames: Iterable[Frame], num_frames: int) -> Iterator[Frame]:
+    """
+    使帧流恰好产出 num_frames 帧：多出的帧不再渲染，不足时重复最后一帧补齐。
+
+    所有效果都按请求的帧数产出，这里只是兜底，保证时间轴与帧数严格对应。
+    """
+    frames = iter(frames)
+    last = None
+    count = 0
+    for last in frames:
+        yield last
+        count += 1
+        if count >= num_frames:
+            break
+    close = getattr(frames, "close", None)
+    if close is not None:
+        close()
+    if last is not None:
+        for _ in range(count, num_frames):
+            yield last
+
+
+def timed_frames(frames: Iterable[Frame], frame_delay: float, unit: int = 1000,
+                 min_delay: int = 1) -> Iterator[TimedFrame]:
+    """
+    将固定帧率的帧流转换为可变延迟的时间轴。
+
+    连续产出的同一个帧对象（效果层对重复帧复用引用）合并为一段；
+    距当前段起点不足 min_delay 的帧并入当前段不单独写出，
+    但最后一帧总会显示，保证动画停在正确的结束状态。
+
+    Args:
+        frames: 帧流
+        frame_delay: 每帧的标称延迟（秒）
+        unit: 时间戳的单位为 1 / unit 秒
+        min_delay: 每段的最短时长，小于该值的段会被合并
+
+    Returns:
+        按时间顺序排列的各段，首段从 0 开始，末段在总时长处结束
+    """
+    pending = None
+    last = None
+    count = 0
+    for index, frame in enumerate(frames):
+        count = index + 1
+        if frame is last:
+            continue
+        last = frame
+        start = frame_timestamp(index, frame_delay, unit)
+        if pending is None:
+            pending = TimedFrame(frame, start, start)
+        elif start - pending.start >= min_delay:
+            yield pending._replace(end=start)
+            pending = TimedFrame(frame, start, start)
+    if pending is None:
+        return
+
+    end = frame_timestamp(count, frame_delay, unit)
+    # 最后一帧被并入前一段时，由它代替前一段显示，动画停在结束状态
+    yield TimedFrame(last, pending.start, max(end, pending.start + min_delay))